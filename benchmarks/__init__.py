@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Benchmark suite on a generated library; run with python -m benchmarks (see run.py for the options).
@@ -0,0 +1,255 @@
+# benchmarks/run.py
+# Times the hot paths against a synthetic library and writes the results as JSON:
+#   python -m benchmarks --titles 5000 -o bench.json
+#   python -m benchmarks --titles 5000 --compare bench.json    (after a change, against the earlier run)
+# Everything runs in a temporary directory, so data/ of the real library is never touched.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import database
+from library_snapshot import build_snapshot_from_database, load_snapshot
+from scanner import LibraryScanner
+from tag_index import bitset_contains
+from thumbnails import flush_index, get_thumbnail_path
+from benchmarks.synthetic_library import generate_library, assign_random_tags
+
+DETAILS_SAMPLE_SIZE = 200
+VIEWPORT_SIZE = (900, 700)
+SCROLL_STEPS = 50
+
+
+def measure(func, repeat):
+    """Run func repeat times; returns timings in milliseconds and the last result."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"min_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3), "runs": repeat}, result
+
+
+def run_import(root, jobs):
+    scanner = LibraryScanner(max_workers=jobs)
+    scanner.start(root)
+    while True:
+        for event in scanner.drain_events():
+            if event[0] == "finished":
+                return event[1]
+        time.sleep(0.01)
+
+
+def bench_database(args, results, root, posters):
+    timing, _ = measure(database.init_db, 1)
+    results["init_db_fresh"] = timing
+    results["init_db_current"], _ = measure(database.init_db, args.repeat)
+
+    started = time.perf_counter()
+    stats = run_import(root, args.jobs)
+    results["import"] = {"ms": round((time.perf_counter() - started) * 1000, 3), "added": stats["added"],
+                         "rows": stats["rows"], "errors": stats["errors"]}
+
+    started = time.perf_counter()
+    tag_counts = assign_random_tags(args.tags, args.tags_per_title, posters, seed=args.seed)
+    results["assign_tags"] = {"ms": round((time.perf_counter() - started) * 1000, 3), "tags": len(tag_counts)}
+
+    # The most popular tags, so that the first few filters still return titles
+    popular = sorted(tag_counts, key=tag_counts.get, reverse=True)
+    for count in range(1, 6):
+        timing, rows = measure(lambda: database.get_filtered_movies(popular[:count]), args.repeat)
+        results[f"get_filtered_movies_{count}_tags"] = {**timing, "titles": len(rows)}
+
+    results["get_movie_summaries"], movies = measure(database.get_movie_summaries, args.repeat)
+    sample = random.Random(args.seed).sample([movie["id"] for movie in movies], min(DETAILS_SAMPLE_SIZE, len(movies)))
+    timing, _ = measure(lambda: [database.get_movie_details(movie_id) for movie_id in sample], args.repeat)
+    results["get_movie_details"] = {**timing, "calls": len(sample),
+                                    "per_call_ms": round(timing["median_ms"] / max(1, len(sample)), 4)}
+    timing, _ = measure(lambda: [database.get_movie_files_page(movie_id) for movie_id in sample], args.repeat)
+    results["get_movie_files_page"] = {**timing, "calls": len(sample)}
+
+    # What apply_filters does in the GUI: bitset match over the in-memory tag index, then one pass over the list
+    database.reload_tag_index()
+    index = database.get_tag_index()
+
+    def filter_in_memory():
+        contains = bitset_contains(index.match(all_of=popular[:2], none_of=popular[2:3]))
+        return [movie for movie in movies if contains(movie["id"])]
+
+    timing, shown = measure(filter_in_memory, args.repeat)
+    results["tag_filter_in_memory"] = {**timing, "titles": len(shown)}
+
+    timing, _ = measure(lambda: database.search_movie_ids("episode ghost"), args.repeat)
+    results["search"] = timing
+
+    results["snapshot_build"], _ = measure(build_snapshot_from_database, args.repeat)
+    results["snapshot_load"], _ = measure(load_snapshot, args.repeat)
+
+    if posters:
+        timing, _ = measure(lambda: [get_thumbnail_path(path, "grid") for path in posters], 1)
+        results["thumbnails_cold"] = {**timing, "posters": len(posters)}
+        results["thumbnails_warm"], _ = measure(lambda: [get_thumbnail_path(path, "grid") for path in posters],
+                                                args.repeat)
+    return movies
+
+
+def bench_views(args, results, movies):
+    # The real list/grid widgets with simplified rows; needs a display (e.g. xvfb-run on a server)
+    try:
+        import customtkinter as ctk
+        from ui_widgets import VirtualList, VirtualGrid
+        root = ctk.CTk()
+    except Exception as e:
+        results["list_population"] = results["grid_population"] = {"skipped": f"no display: {e}"}
+        return
+    root.geometry(f"{VIEWPORT_SIZE[0]}x{VIEWPORT_SIZE[1]}")
+
+    def create_row(parent):
+        row = ctk.CTkFrame(parent, height=40, fg_color="transparent")
+        row.pack_propagate(False)
+        row.title_var = ctk.StringVar()
+        ctk.CTkEntry(row, textvariable=row.title_var, border_width=0).pack(side="left", fill="x", expand=True)
+        return row
+
+    def create_tile(parent):
+        tile = ctk.CTkFrame(parent, width=120, height=210)
+        tile.pack_propagate(False)
+        tile.title_var = ctk.StringVar()
+        ctk.CTkLabel(tile, text="No Poster", width=100, height=150).pack(pady=(10, 5))
+        ctk.CTkEntry(tile, textvariable=tile.title_var, border_width=0).pack(fill="x")
+        return tile
+
+    def bind_row(row, movie, index):
+        row.title_var.set(movie["title"])
+
+    views = {
+        "list": VirtualList(root, create_row=create_row, bind_row=bind_row, row_height=40,
+                            key=lambda movie: movie["id"]),
+        "grid": VirtualGrid(root, create_row=create_tile, bind_row=bind_row, tile_width=120, tile_height=210,
+                            overscan=1, key=lambda movie: movie["id"]),
+    }
+    try:
+        for name, view in views.items():
+            view.pack(fill="both", expand=True)
+            root.update()
+
+            def populate():
+                view.set_items(movies)
+                root.update()
+
+            timing, _ = measure(populate, args.repeat)
+
+            def scroll():
+                for step in range(SCROLL_STEPS):
+                    view._scroll_rows(3)
+                    root.update()
+
+            scroll_timing, _ = measure(scroll, args.repeat)
+            results[f"{name}_population"] = {**timing, "rows_created": len(view.rows)}
+            results[f"{name}_scroll"] = {**scroll_timing, "steps": SCROLL_STEPS,
+                                         "per_step_ms": round(scroll_timing["median_ms"] / SCROLL_STEPS, 3)}
+            view.pack_forget()
+    finally:
+        root.destroy()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline, current):
+    # Prints old vs new median (or total) per benchmark; ratio > 1 means slower than the baseline.
+    # Goes to stderr, so that standard output stays valid JSON
+    print(f"{'benchmark':34} {'baseline':>12} {'current':>12} {'ratio':>7}", file=sys.stderr)
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name, {})
+        key = "median_ms" if "median_ms" in result else "ms"
+        if key not in result or key not in old:
+            continue
+        ratio = result[key] / old[key] if old[key] else float("inf")
+        print(f"{name:34} {old[key]:12.3f} {result[key]:12.3f} {ratio:7.2f}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the library on a synthetic collection.")
+    parser.add_argument("--titles", type=int, default=2000, help="video titles (default: %(default)s)")
+    parser.add_argument("--files", type=int, default=12, help="video files per title (default: %(default)s)")
+    parser.add_argument("--galleries", type=int, default=100, help="image gallery titles (default: %(default)s)")
+    parser.add_argument("--images", type=int, default=60, help="images per gallery (default: %(default)s)")
+    parser.add_argument("--tags", type=int, default=60, help="distinct tags (default: %(default)s)")
+    parser.add_argument("--tags-per-title", type=int, default=3, help="average tags per title (default: %(default)s)")
+    parser.add_argument("--posters", type=int, default=100, help="titles that get a poster (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timed query (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=8, help="scanner workers for the import (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-gui", action="store_true", help="skip the list/grid widget benchmarks")
+    parser.add_argument("--output", "-o", help="write the JSON results here (default: standard output)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print ratios against an earlier JSON result")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary library directory")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="media-library-bench-")
+    previous_cwd = os.getcwd()
+    # data/ paths (database, posters, thumbnails, snapshot) are relative to the working directory
+    os.chdir(workdir)
+    os.makedirs(os.path.join('data', 'posters'))
+    database.DB_PATH = os.path.join('data', 'library.db')
+    results = {}
+    try:
+        root = os.path.join(workdir, 'library')
+        started = time.perf_counter()
+        posters = generate_library(root, args.titles, args.files, args.galleries, args.images, args.posters, args.seed)
+        generate_ms = round((time.perf_counter() - started) * 1000, 3)
+        print(f"Generated {args.titles + args.galleries} titles in {workdir} ({generate_ms:.0f} ms)", file=sys.stderr)
+        # Migration messages go to stderr, so that JSON on standard output stays clean
+        with contextlib.redirect_stdout(sys.stderr):
+            movies = bench_database(args, results, root, posters)
+            if not args.no_gui:
+                bench_views(args, results, movies)
+    finally:
+        database.close_connection()
+        # The thumbnail index is otherwise written at exit, relative to whatever the working directory is then
+        flush_index()
+        os.chdir(previous_cwd)
+        if args.keep:
+            print(f"Kept {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "params": {name: value for name, value in vars(args).items() if name not in ("output", "compare", "keep")},
+        "generate_ms": generate_ms,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
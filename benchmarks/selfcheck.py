@@ -0,0 +1,244 @@
+# benchmarks/selfcheck.py
+# Regression checks for the parts whose output is easy to change by accident:
+#   python -m benchmarks.selfcheck
+# - classify_entries (early-exit classifier) against the original listdir/isfile rule, on random folders
+# - compute_rescan_delta against added, removed and changed files in a real folder tree
+# - PosterLoader(workers=0): priority order, dropping from a full queue and cancellation
+# Runs in a temporary directory like the benchmarks; exits with 1 if anything differs.
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import database
+from classifier import (IMAGE_EXTENSIONS, IMAGE_FILE_COUNT_THRESHOLD, IMAGE_PERCENTAGE_THRESHOLD,
+                        classify_entries, classify_folder)
+from poster_loader import PRIORITY_DETAILS, PRIORITY_PREFETCH, PRIORITY_VISIBLE, PosterLoader
+from scanner import apply_rescan_deltas, compute_rescan_delta, scan_title, walk_title, write_scan_batch
+
+EXTENSIONS = IMAGE_EXTENSIONS + ['.JPG', '.mkv', '.mp4', '.srt', '.nfo', '']
+OLD_MTIME_NS = 1_000_000_000 * 1_000_000_000  # 2001; anything written during the check is newer
+
+
+def reference_classify(names_and_kinds):
+    """The rule classify_entries replaced (scanner.detect_content_type before it stopped early)."""
+    files_only = [name for name, is_file in names_and_kinds if is_file]
+    if len(files_only) > 0 and len(files_only) > IMAGE_FILE_COUNT_THRESHOLD:
+        image_count = sum(1 for f in files_only if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
+        if (image_count / len(files_only)) > IMAGE_PERCENTAGE_THRESHOLD: return 'gallery'
+    return 'video'
+
+
+class FakeEntry:
+    # The two DirEntry members classify_entries uses
+    def __init__(self, name, is_file):
+        self.name = name
+        self._is_file = is_file
+
+    def is_file(self):
+        return self._is_file
+
+
+def random_folder(rng):
+    # Sizes and image shares cluster around the thresholds, where an early exit can go wrong
+    count = rng.choice((rng.randint(0, 5), rng.randint(25, 45), rng.randint(0, 200)))
+    image_share = rng.choice((IMAGE_PERCENTAGE_THRESHOLD, rng.random(), rng.uniform(0.7, 0.9), 1.0))
+    entries = []
+    for number in range(count):
+        if rng.random() < 0.1:
+            entries.append((f"folder {number}", False))
+        elif rng.random() < image_share:
+            entries.append((f"{number}{rng.choice(IMAGE_EXTENSIONS)}", True))
+        else:
+            entries.append((f"{number}{rng.choice(EXTENSIONS)}", True))
+    return entries
+
+
+def check_classifier(rounds, seed, workdir, failures):
+    rng = random.Random(seed)
+    for round_number in range(rounds):
+        entries = random_folder(rng)
+        expected = reference_classify(entries)
+        actual = classify_entries([FakeEntry(name, is_file) for name, is_file in entries])
+        if actual != expected:
+            failures.append(f"classify_entries round {round_number}: {actual}, expected {expected} for {entries}")
+    # A few real folders, so classify_folder's scandir path is covered as well
+    for number in range(20):
+        folder = os.path.join(workdir, 'classify', str(number))
+        os.makedirs(folder)
+        entries = random_folder(rng)
+        for name, is_file in entries:
+            path = os.path.join(folder, name)
+            if is_file:
+                open(path, 'wb').close()
+            else:
+                os.makedirs(path)
+        on_disk = [(name, os.path.isfile(os.path.join(folder, name))) for name in os.listdir(folder)]
+        if classify_folder(folder) != reference_classify(on_disk):
+            failures.append(f"classify_folder {folder}: {classify_folder(folder)}, expected {reference_classify(on_disk)}")
+    return rounds + 20
+
+
+def _write(path, data=b''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _age_tree(folder):
+    for dir_path, dir_names, file_names in os.walk(folder):
+        for name in file_names:
+            os.utime(os.path.join(dir_path, name), ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+        os.utime(dir_path, ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+
+
+def _stored_files(movie_id):
+    return dict(database.get_connection().execute(
+        "SELECT file_path, size FROM files WHERE movie_id = ?", (movie_id,)))
+
+
+def check_rescan_delta(workdir, failures):
+    folder = os.path.join(workdir, 'library', 'Title')
+    for path in ('a.mkv', 'b.srt', os.path.join('Extras', 'c.mkv'), os.path.join('Extras', 'd.mkv'),
+                 os.path.join('Extras', 'Deep', 'e.mkv'), os.path.join('Old', 'f.mkv')):
+        _write(os.path.join(folder, path), b'x')
+    _age_tree(folder)
+    ((movie_id, _),) = write_scan_batch([scan_title('Title', folder)])
+
+    def expect(name, actual, expected):
+        if actual != expected:
+            failures.append(f"compute_rescan_delta {name}: {actual}, expected {expected}")
+
+    delta = compute_rescan_delta(movie_id, folder)
+    expect("unchanged tree rows", delta.row_count, 0)
+    expect("unchanged tree skipped dirs", delta.dirs_skipped, 4)
+
+    paths = {name: os.path.join(folder, name) for name in
+             ('a.mkv', 'b.srt', 'new.mkv', 'Extras/c.mkv', 'Extras/d.mkv', 'Extras/Deep/e.mkv', 'Extras/Deep/g.mkv')}
+    paths = {name: os.path.normpath(path) for name, path in paths.items()}
+    file_ids = {path: file_id for file_id, path in database.get_connection().execute(
+        "SELECT id, file_path FROM files WHERE movie_id = ?", (movie_id,))}
+    _write(paths['new.mkv'], b'new')  # added at the top level
+    os.remove(paths['b.srt'])  # removed from the top level
+    _write(paths['Extras/c.mkv'], b'longer')  # changed; d.mkv is removed, so Extras is re-listed
+    os.remove(paths['Extras/d.mkv'])
+    _write(paths['Extras/Deep/g.mkv'], b'g')  # added two levels down
+    shutil.rmtree(os.path.join(folder, 'Old'))  # a whole directory removed
+
+    delta = compute_rescan_delta(movie_id, folder)
+    expect("added", sorted(row[0] for row in delta.added_files), sorted([paths['new.mkv'], paths['Extras/Deep/g.mkv']]))
+    expect("updated", [(size, file_id) for size, _, file_id in delta.updated_files],
+           [(len(b'longer'), file_ids[paths['Extras/c.mkv']])])
+    expect("removed", sorted(delta.removed_file_ids),
+           sorted(file_ids[path] for path in (paths['b.srt'], paths['Extras/d.mkv'],
+                                              os.path.join(folder, 'Old', 'f.mkv'))))
+    expect("removed dirs", delta.removed_dirs, [os.path.join(folder, 'Old')])
+
+    apply_rescan_deltas([delta])
+    files, _ = walk_title(folder)
+    expect("files after rescan", _stored_files(movie_id), {path: size for path, size, *_ in files})
+    delta = compute_rescan_delta(movie_id, folder)
+    expect("second rescan rows", delta.row_count, 0)
+
+
+def check_poster_loader(failures):
+    decoded = []
+    delivered = []
+
+    def decode(poster_path, variant):
+        decoded.append(poster_path)
+        return poster_path
+
+    def callback(name):
+        return lambda value: delivered.append((name, value))
+
+    def expect(name, actual, expected):
+        if actual != expected:
+            failures.append(f"PosterLoader {name}: {actual}, expected {expected}")
+
+    # finish() gets the decoded "image"; its result is what the callbacks see
+    loader = PosterLoader(decode, lambda key, pil_image: f"{pil_image}:{key[1]}", workers=0)
+    loader.request("prefetch", "grid", callback("prefetch"), PRIORITY_PREFETCH)
+    loader.request("visible", "grid", callback("visible"), PRIORITY_VISIBLE)
+    loader.request("scrolled in", "grid", callback("scrolled in"), PRIORITY_PREFETCH)
+    loader.request("details", "details", callback("details"), PRIORITY_DETAILS)
+    loader.request("scrolled in", "grid", callback("scrolled in again"), PRIORITY_VISIBLE)
+    expect("queued before delivery", (loader.pending(), decoded), (4, []))
+    loader.run_pending()
+    expect("decode order", decoded, ["details", "visible", "scrolled in", "prefetch"])
+    expect("callbacks", delivered, [("details", "details:details"), ("visible", "visible:grid"),
+                                    ("scrolled in", "scrolled in:grid"), ("scrolled in again", "scrolled in:grid"),
+                                    ("prefetch", "prefetch:grid")])
+
+    # The oldest request of the lowest priority is dropped; its callback gets None and it is never decoded
+    decoded.clear()
+    delivered.clear()
+    loader = PosterLoader(decode, lambda key, pil_image: pil_image, workers=0, max_queued=2)
+    old = loader.request("old prefetch", "grid", callback("old prefetch"), PRIORITY_PREFETCH)
+    loader.request("new prefetch", "grid", callback("new prefetch"), PRIORITY_PREFETCH)
+    loader.request("visible", "grid", callback("visible"), PRIORITY_VISIBLE)
+    expect("dropped state", old.state, "dropped")
+    expect("pending after drop", loader.pending(), 2)
+    loader.run_pending()
+    expect("decoded after drop", decoded, ["visible", "new prefetch"])
+    expect("callbacks after drop", delivered,
+           [("old prefetch", None), ("visible", "visible"), ("new prefetch", "new prefetch")])
+
+    # A cancelled callback is never called; another callback on the same poster still is
+    decoded.clear()
+    delivered.clear()
+    loader = PosterLoader(decode, lambda key, pil_image: pil_image, workers=0)
+    cancelled = callback("cancelled")
+    gone = loader.request("gone", "grid", cancelled)
+    loader.cancel(gone, cancelled)
+    shared = callback("shared, cancelled")
+    request = loader.request("shared", "grid", shared)
+    loader.request("shared", "grid", callback("shared, kept"))
+    loader.cancel(request, shared)
+    loader.request("other", "grid", callback("other"))
+    expect("cancelled states", (gone.state, request.state), ("cancelled", "queued"))
+    loader.run_pending()
+    expect("decoded after cancel", decoded, ["shared", "other"])
+    expect("callbacks after cancel", delivered, [("shared, kept", "shared"), ("other", "other")])
+    expect("pending after cancel", loader.pending(), 0)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.selfcheck",
+                                     description="Check the classifier, rescan delta and poster loader "
+                                                 "against reference results.")
+    parser.add_argument("--rounds", type=int, default=5000, help="random folders for the classifier (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="media-library-selfcheck-")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    os.makedirs('data')
+    database.DB_PATH = os.path.join('data', 'library.db')
+    failures = []
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            database.init_db()
+        classified = check_classifier(args.rounds, args.seed, workdir, failures)
+        check_rescan_delta(workdir, failures)
+        check_poster_loader(failures)
+    finally:
+        database.close_connection()
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print(f"{classified} folders classified, rescan delta and poster loader checked: "
+          f"{'OK' if not failures else f'{len(failures)} failures'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
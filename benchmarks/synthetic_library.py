@@ -0,0 +1,82 @@
+# benchmarks/synthetic_library.py
+# Builds a fake media library on disk: video titles with M files each, image galleries with K images,
+# a set of small JPEG posters, and (once imported) a skewed random tag assignment.
+import os
+import random
+
+VIDEO_FILE_EXTENSIONS = ('.mkv', '.mp4', '.avi')
+EXTRA_FILE_EXTENSIONS = ('.srt', '.nfo')
+GALLERY_IMAGE_EXTENSIONS = ('.jpg', '.png', '.webp')
+WORDS = ("ghost", "shell", "night", "city", "blue", "summer", "war", "river", "star", "garden", "iron", "silent",
+         "last", "winter", "red", "dream", "machine", "island", "storm", "paper")
+POSTER_SIZE = (600, 900)
+
+
+def _title(rng, number):
+    return f"{' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 4)))} ({number})"
+
+
+def generate_library(root, titles, files_per_title, galleries, images_per_gallery, posters=0, seed=0):
+    """Create the folders under root and the posters beside it; returns the list of poster paths.
+
+    Files are empty: the scanner only looks at names, sizes and modification times, and the classifier
+    only at extensions, so content would just cost disk space.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    for number in range(titles):
+        folder = os.path.join(root, _title(rng, number))
+        os.makedirs(folder)
+        for episode in range(files_per_title):
+            name = f"Episode {episode + 1:03d}"
+            open(os.path.join(folder, name + rng.choice(VIDEO_FILE_EXTENSIONS)), 'wb').close()
+            if rng.random() < 0.3:
+                open(os.path.join(folder, name + rng.choice(EXTRA_FILE_EXTENSIONS)), 'wb').close()
+    for number in range(galleries):
+        folder = os.path.join(root, _title(rng, titles + number) + " [gallery]")
+        os.makedirs(folder)
+        for page in range(images_per_gallery):
+            open(os.path.join(folder, f"{page + 1:04d}{rng.choice(GALLERY_IMAGE_EXTENSIONS)}"), 'wb').close()
+    # Next to the root, not inside it: every folder in the root is imported as a title
+    return generate_posters(os.path.normpath(root) + '-posters', posters, rng) if posters else []
+
+
+def generate_posters(folder, count, rng):
+    from PIL import Image, ImageDraw
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for number in range(count):
+        image = Image.new('RGB', POSTER_SIZE, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x, y = rng.randrange(POSTER_SIZE[0]), rng.randrange(POSTER_SIZE[1])
+            draw.rectangle((x, y, x + rng.randrange(50, 300), y + rng.randrange(50, 300)),
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        path = os.path.join(folder, f"poster_{number:05d}.jpg")
+        image.save(path, 'JPEG', quality=85)
+        paths.append(path)
+    return paths
+
+
+def assign_random_tags(tag_count, tags_per_title, poster_paths=(), seed=0):
+    """Create tag_count tags and give each title about tags_per_title of them; returns {tag: title count}.
+
+    Tag popularity falls off like 1/rank, as in real libraries where a few genres cover most titles.
+    Posters are attached to randomly chosen titles. Must run after the library has been imported.
+    """
+    import database
+    rng = random.Random(seed)
+    movie_ids = [row[0] for row in database.get_filtered_movies()]
+    tags = [f"tag{number:03d}" for number in range(tag_count)]
+    weights = [1 / (rank + 1) for rank in range(tag_count)]
+    members = {tag: [] for tag in tags}
+    for movie_id in movie_ids:
+        for tag in set(rng.choices(tags, weights, k=rng.randint(0, 2 * tags_per_title))):
+            members[tag].append(movie_id)
+    for tag in tags:
+        database.add_new_tag(tag)
+        database.assign_tag_to_movies(members[tag], tag)
+    with database.transaction():
+        for poster_path, movie_id in zip(poster_paths, rng.sample(movie_ids, min(len(poster_paths), len(movie_ids)))):
+            database.update_movie_poster(movie_id, poster_path)
+    return {tag: len(members[tag]) for tag in tags}
@@ -0,0 +1,66 @@
+# classifier.py
+import os
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.gif']
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm')
+SUBTITLE_EXTENSIONS = ('.srt', '.ass', '.ssa', '.sub', '.idx', '.vtt', '.sup')
+IMAGE_FILE_COUNT_THRESHOLD = 30
+IMAGE_PERCENTAGE_THRESHOLD = 0.8
+
+_IMAGE_EXTENSION_SET = frozenset(IMAGE_EXTENSIONS)
+
+# Values of files.kind
+FILE_KIND_VIDEO = 'video'
+FILE_KIND_IMAGE = 'image'
+FILE_KIND_SUBTITLE = 'subtitle'
+FILE_KIND_OTHER = 'other'
+_KIND_BY_EXTENSION = {
+    **{ext: FILE_KIND_IMAGE for ext in IMAGE_EXTENSIONS},
+    **{ext: FILE_KIND_VIDEO for ext in VIDEO_EXTENSIONS},
+    **{ext: FILE_KIND_SUBTITLE for ext in SUBTITLE_EXTENSIONS},
+}
+
+
+def file_kind(file_path):
+    """Return (extension, kind) for a file path; the extension is lower-case with its dot, or ''."""
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension, _KIND_BY_EXTENSION.get(extension, FILE_KIND_OTHER)
+
+
+def classify_entries(entries):
+    """Decide 'gallery' or 'video' from a folder's top-level DirEntry list.
+
+    A folder is a gallery when it holds more than IMAGE_FILE_COUNT_THRESHOLD files and more than
+    IMAGE_PERCENTAGE_THRESHOLD of them are images. Entries are examined one by one and the loop stops as
+    soon as the remaining ones can no longer change the outcome.
+    """
+    remaining = len(entries)
+    images = 0
+    others = 0
+    for entry in entries:
+        remaining -= 1
+        if not entry.is_file():
+            continue
+        if os.path.splitext(entry.name)[1].lower() in _IMAGE_EXTENSION_SET:
+            images += 1
+        else:
+            others += 1
+        most_files = images + others + remaining
+        # Worst case for a gallery: every remaining entry is a non-image file
+        if images + others > IMAGE_FILE_COUNT_THRESHOLD and images / most_files > IMAGE_PERCENTAGE_THRESHOLD:
+            return 'gallery'
+        # Best case for a gallery: every remaining entry is an image
+        if most_files <= IMAGE_FILE_COUNT_THRESHOLD or (images + remaining) / most_files <= IMAGE_PERCENTAGE_THRESHOLD:
+            return 'video'
+    # Only reached when the last entries were subfolders, so neither bound was checked with the final counts
+    files = images + others
+    if files > IMAGE_FILE_COUNT_THRESHOLD and images / files > IMAGE_PERCENTAGE_THRESHOLD:
+        return 'gallery'
+    return 'video'
+
+
+def classify_folder(folder_path):
+    # Only the top level counts; DirEntry type info avoids a stat per file on most filesystems
+    with os.scandir(folder_path) as it:
+        entries = list(it)
+    return classify_entries(entries)
@@ -0,0 +1,193 @@
+# cli.py
+# Headless access to the library, for servers and cron:
+#   python -m cli import D:/Movies --jobs 8
+#   python -m cli rescan
+#   python -m cli tag Anime --glob "*Ghost*"
+#   python -m cli export --format csv -o library.csv
+# Only the database layer is imported up front; GUI libraries are never loaded.
+import argparse
+import contextlib
+import os
+import re
+import sys
+import time
+
+import database
+
+PROGRESS_INTERVAL_SECONDS = 1.0
+# Same as scanner.DEFAULT_SCAN_WORKERS(_PER_DEVICE); scanner itself is only imported by the commands that scan
+DEFAULT_JOBS = 8
+DEFAULT_JOBS_PER_DEVICE = 4
+
+
+def _run_scan(start, args):
+    from scanner import LibraryScanner
+    scanner = LibraryScanner(max_workers=args.jobs, workers_per_device=args.jobs_per_device)
+    start(scanner)
+    show_progress = sys.stderr.isatty()
+    last_progress = 0.0
+    stats = None
+    while stats is None:
+        try:
+            time.sleep(0.1)
+            for event in scanner.drain_events():
+                kind = event[0]
+                if kind == "error":
+                    print(f"Error: {event[1]}: {event[2]}", file=sys.stderr)
+                elif kind == "progress" and show_progress and time.monotonic() - last_progress > PROGRESS_INTERVAL_SECONDS:
+                    last_progress = time.monotonic()
+                    print(f"\rScanned {event[1]} of {event[2]} folders", end="", file=sys.stderr)
+                elif kind == "finished":
+                    stats = event[1]
+        except KeyboardInterrupt:
+            # Titles scanned so far are still written before the scanner finishes
+            print("\nCancelling...", file=sys.stderr)
+            scanner.cancel()
+    if show_progress and last_progress:
+        print(file=sys.stderr)
+    print(f"{'Cancelled' if stats['cancelled'] else 'Done'}: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged, {stats['skipped']} skipped, {stats['errors']} errors "
+          f"({stats['rows']} rows in {stats['seconds']:.1f}s, {stats['devices']} devices)")
+    return 1 if stats["errors"] or stats["cancelled"] else 0
+
+
+def cmd_import(args):
+    roots = [database.normalize_path(root) for root in args.roots]
+    missing = [root for root in roots if not os.path.isdir(root)]
+    for root in missing:
+        print(f"Error: '{root}' is not a directory.", file=sys.stderr)
+    roots = [root for root in roots if root not in missing]
+    if not roots:
+        return 1
+    # All roots go into one scan, so folders on different disks are scanned at the same time
+    print(f"Importing {', '.join(roots)}")
+    return _run_scan(lambda scanner: scanner.start(roots), args) or (1 if missing else 0)
+
+
+def cmd_rescan(args):
+    root = database.normalize_path(args.root) if args.root else None
+    return _run_scan(lambda scanner: scanner.start_rescan(root), args)
+
+
+def _title_matcher(args):
+    import fnmatch
+    if args.glob is not None:
+        pattern = re.compile(fnmatch.translate(args.glob), re.IGNORECASE)
+        return pattern.match
+    pattern = re.compile(args.regex, 0 if args.case_sensitive else re.IGNORECASE)
+    return pattern.search
+
+
+def cmd_tag(args):
+    # Tag names are stored stripped, so " drama" must find the same tag when adding and when removing
+    tag = args.tag.strip()
+    if not tag:
+        print("Error: the tag name is empty.", file=sys.stderr)
+        return 2
+    try:
+        matches = _title_matcher(args)
+    except re.error as e:
+        print(f"Error: invalid pattern: {e}", file=sys.stderr)
+        return 2
+    field = 2 if args.path else 1
+    movies = [movie for movie in database.get_filtered_movies() if matches(movie[field])]
+    if args.dry_run:
+        for movie in movies:
+            print(movie[1])
+        print(f"{len(movies)} titles match.")
+        return 0
+    if args.remove:
+        changed = database.remove_tag_from_movies([movie[0] for movie in movies], tag)
+        print(f"Removed '{tag}' from {changed} of {len(movies)} matching titles.")
+    else:
+        database.add_new_tag(tag)
+        changed = database.assign_tag_to_movies([movie[0] for movie in movies], tag)
+        print(f"Tagged {changed} of {len(movies)} matching titles with '{tag}'.")
+    return 0
+
+
+def cmd_export(args):
+    sizes = database.get_library_sizes()
+    rows = []
+    for movie in database.get_movie_summaries():
+        file_count, total_size = sizes.get(movie["id"], (0, 0))
+        rows.append({"id": movie["id"], "title": movie["title"], "folder_path": movie["folder_path"],
+                     "content_type": movie["content_type"], "poster_path": movie["poster_path"],
+                     "tags": movie["tags"], "file_count": file_count, "total_size": total_size})
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            import json
+            json.dump(rows, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            import csv
+            writer = csv.DictWriter(out, fieldnames=list(rows[0]) if rows else ["id", "title"])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, "tags": ";".join(row["tags"])})
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.output:
+        print(f"Exported {len(rows)} titles to {args.output}.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Manage the media library without the GUI.")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    jobs_help = "folders scanned in parallel (default: %(default)s)"
+    device_jobs_help = "folders scanned in parallel on one disk or network mount (default: %(default)s)"
+    p = commands.add_parser("import", help="import every subfolder of one or more root folders")
+    p.add_argument("roots", nargs="+")
+    p.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS, help=jobs_help)
+    p.add_argument("--jobs-per-device", type=int, default=DEFAULT_JOBS_PER_DEVICE, help=device_jobs_help)
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("rescan", help="pick up new, changed and removed files")
+    p.add_argument("root", nargs="?", help="only rescan titles under this folder, and import its new subfolders")
+    p.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS, help=jobs_help)
+    p.add_argument("--jobs-per-device", type=int, default=DEFAULT_JOBS_PER_DEVICE, help=device_jobs_help)
+    p.set_defaults(func=cmd_rescan)
+
+    p = commands.add_parser("tag", help="add (or --remove) a tag on every title matching a pattern")
+    p.add_argument("tag")
+    pattern = p.add_mutually_exclusive_group(required=True)
+    pattern.add_argument("--glob", help="shell-style pattern matched against the whole title, case-insensitive")
+    pattern.add_argument("--regex", help="regular expression searched for in the title")
+    p.add_argument("--case-sensitive", action="store_true", help="make --regex case-sensitive")
+    p.add_argument("--path", action="store_true", help="match the folder path instead of the title")
+    p.add_argument("--remove", action="store_true", help="remove the tag instead of adding it")
+    p.add_argument("--dry-run", action="store_true", help="only list the matching titles")
+    p.set_defaults(func=cmd_tag)
+
+    p = commands.add_parser("export", help="write the library with tags and file sizes as JSON or CSV")
+    p.add_argument("--format", choices=("json", "csv"), default="json")
+    p.add_argument("--output", "-o", help="file to write (default: standard output)")
+    p.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "jobs", 1) < 1 or getattr(args, "jobs_per_device", 1) < 1:
+        print("Error: --jobs and --jobs-per-device must be at least 1.", file=sys.stderr)
+        return 2
+    database.DB_PATH = args.db
+    db_dir = os.path.dirname(args.db)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    # Migration messages go to stderr so that exports to standard output stay clean
+    with contextlib.redirect_stdout(sys.stderr):
+        database.init_db()
+    try:
+        return args.func(args)
+    finally:
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
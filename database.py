@@ -1,147 +1,513 @@
 # database.py
 import sqlite3
 import os
+import re
+import threading
+from contextlib import contextmanager
 
-def init_db():
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA foreign_keys = ON")
+from classifier import file_kind
+from image_cache import invalidate_poster
+from tag_index import TagIndex, read_tag_bits
+
+DB_PATH = 'data/library.db'
+STATEMENT_CACHE_SIZE = 256
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -32000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA busy_timeout = 5000",
+)
+
+ALL_MOVIES_QUERY = "SELECT id, title, folder_path FROM movies ORDER BY title ASC"
+MOVIE_FILE_STATS_QUERY = "SELECT kind, COUNT(*), SUM(size) FROM files WHERE movie_id = ? GROUP BY kind"
+LIBRARY_SIZES_QUERY = "SELECT movie_id, COUNT(*), SUM(size) FROM files GROUP BY movie_id"
+MOVIES_WITHOUT_VIDEOS_QUERY = """
+    SELECT m.id FROM movies m
+    WHERE m.content_type = 'video'
+      AND NOT EXISTS (SELECT 1 FROM files f WHERE f.movie_id = m.id AND f.kind = 'video')
+"""
+FILES_PAGE_SIZE = 200
+MOVIE_TAGS_QUERY = "SELECT t.name FROM tags t JOIN movie_tags mt ON t.id = mt.tag_id WHERE mt.movie_id = ? ORDER BY t.name"
+SEARCH_QUERY = """
+    SELECT rowid FROM movies_fts WHERE movies_fts MATCH ?
+    UNION
+    SELECT f.movie_id FROM files_fts JOIN files f ON f.id = files_fts.rowid WHERE files_fts MATCH ?
+"""
+
+_local = threading.local()
+# Kept in sync by the tag functions below; loaded from the database on first use
+tag_index = TagIndex()
+
+
+def normalize_path(path):
+    # The one form folder and file paths are stored in: the GUI's file dialog returns "D:/Movies" on Windows,
+    # the command line "D:\\Movies", and both must map to the same rows
+    return os.path.normpath(os.path.abspath(path))
+
+
+def get_connection():
+    # One long-lived connection per thread, opened lazily on first use
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.depth = 0
+
+
+@contextmanager
+def transaction():
+    """Run several statements atomically; nested blocks join the outermost transaction."""
+    conn = get_connection()
+    if _local.depth == 0:
+        conn.execute("BEGIN")
+    _local.depth += 1
     try:
-        cursor.execute("ALTER TABLE movies ADD COLUMN content_type TEXT NOT NULL DEFAULT 'video'")
-    except sqlite3.OperationalError: pass
-    cursor.execute('''
+        yield conn
+    except BaseException:
+        _local.depth -= 1
+        if _local.depth == 0:
+            conn.execute("ROLLBACK")
+        raise
+    _local.depth -= 1
+    if _local.depth == 0:
+        try:
+            conn.execute("COMMIT")
+        except BaseException:
+            # E.g. SQLITE_BUSY or a deferred constraint: the transaction is still open, and the next BEGIN would fail
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _add_column_if_missing(conn, table, column, definition):
+    if column not in _table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_1_base_schema(conn):
+    # Databases created before migrations existed are at user_version 0 and may already have any of this
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS movies (
             id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, folder_path TEXT NOT NULL UNIQUE,
             poster_path TEXT, content_type TEXT NOT NULL DEFAULT 'video'
         )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)''')
-    cursor.execute('''
+    _add_column_if_missing(conn, "movies", "content_type", "TEXT NOT NULL DEFAULT 'video'")
+    conn.execute('''CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)''')
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS movie_tags (
             movie_id INTEGER, tag_id INTEGER,
             FOREIGN KEY (movie_id) REFERENCES movies (id) ON DELETE CASCADE,
             FOREIGN KEY (tag_id) REFERENCES tags (id) ON DELETE CASCADE,
             PRIMARY KEY (movie_id, tag_id))''')
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS files (
             id INTEGER PRIMARY KEY AUTOINCREMENT, movie_id INTEGER, file_path TEXT NOT NULL,
+            size INTEGER, mtime_ns INTEGER,
+            FOREIGN KEY (movie_id) REFERENCES movies (id) ON DELETE CASCADE)''')
+    _add_column_if_missing(conn, "files", "size", "INTEGER")
+    _add_column_if_missing(conn, "files", "mtime_ns", "INTEGER")
+    # Directory mtimes from the last scan, used by rescans to skip unchanged folders
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS folder_state (
+            dir_path TEXT PRIMARY KEY, movie_id INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
             FOREIGN KEY (movie_id) REFERENCES movies (id) ON DELETE CASCADE)''')
-    conn.commit()
-    conn.close()
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_folder_state_movie_id ON folder_state (movie_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_movie_id ON files (movie_id)")
+
+def _migration_2_secondary_indexes(conn):
+    # (movie_id, file_path) covers the per-title file listing, including its ORDER BY
+    conn.execute("DROP INDEX IF EXISTS idx_files_movie_id")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_movie_id_path ON files (movie_id, file_path)")
+    # The primary key leads with movie_id; tag filters need to start from the tag
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_movie_tags_tag_id ON movie_tags (tag_id, movie_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_movies_title ON movies (title)")
+
+# Bare file name of files.file_path, computed in SQL so the FTS triggers can derive it from the row alone:
+# rtrim() strips the name off the path, leaving the directory prefix to skip
+_FILE_NAME_SQL = "substr({p}, length(rtrim({p}, replace({p}, '/', ''))) + 1)".format(
+    p="replace({col}, '\\', '/')")
+
+def _migration_3_full_text_search(conn):
+    # Titles: external content table over movies. File names: contentless, so the index does not store a
+    # second copy of every path; only the name is indexed so the library root does not match every file.
+    new_name = _FILE_NAME_SQL.format(col="new.file_path")
+    old_name = _FILE_NAME_SQL.format(col="old.file_path")
+    statements = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+            title, content='movies', content_rowid='id', prefix='2 3', tokenize='unicode61 remove_diacritics 2')""",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+            name, content='', prefix='2 3', tokenize='unicode61 remove_diacritics 2')""",
+        """CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts (rowid, title) VALUES (new.id, new.title);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            INSERT INTO movies_fts (rowid, title) VALUES (new.id, new.title);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+            INSERT INTO files_fts (rowid, name) VALUES (new.id, {new_name});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+            INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.id, {old_name});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF file_path ON files BEGIN
+            INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.id, {old_name});
+            INSERT INTO files_fts (rowid, name) VALUES (new.id, {new_name});
+        END""",
+    ]
+    for statement in statements:
+        conn.execute(statement)
+    conn.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO files_fts (files_fts) VALUES ('delete-all')")
+    conn.execute(f"INSERT INTO files_fts (rowid, name) SELECT id, {_FILE_NAME_SQL.format(col='file_path')} FROM files")
+
+def _migration_4_file_kinds(conn):
+    # Extension and kind are derived from the path once, at scan time, so queries can filter and aggregate on them
+    _add_column_if_missing(conn, "files", "extension", "TEXT")
+    _add_column_if_missing(conn, "files", "kind", "TEXT")
+    rows = [(*file_kind(file_path), file_id)
+            for file_id, file_path in conn.execute("SELECT id, file_path FROM files WHERE kind IS NULL")]
+    conn.executemany("UPDATE files SET extension = ?, kind = ? WHERE id = ?", rows)
+    # (movie_id, kind, file_path) serves the details file pages and "has no video" checks,
+    # (movie_id, kind, size) answers count/size aggregates from the index alone
+    conn.execute("DROP INDEX IF EXISTS idx_files_movie_id_path")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_movie_kind_path ON files (movie_id, kind, file_path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_movie_kind_size ON files (movie_id, kind, size)")
+
+def _migration_5_change_counter(conn):
+    # Persistent counter bumped by every change to titles and tags; the startup snapshot records the value it
+    # was built from. SQLite's own file change counter is not kept up to date in WAL mode.
+    conn.execute("CREATE TABLE IF NOT EXISTS library_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO library_state (key, value) VALUES ('change_counter', 0)")
+    bump = "UPDATE library_state SET value = value + 1 WHERE key = 'change_counter'"
+    for table in ("movies", "tags", "movie_tags"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_changed_{event.lower()} AFTER {event} ON {table}
+                             BEGIN {bump}; END""")
+
+def _migration_6_normalized_paths(conn):
+    # Paths imported from the GUI kept the file dialog's separators, so the same folder imported again from the
+    # command line became a second title. Stored paths get the form normalize_path gives new ones. Of titles that
+    # now share a folder, one survives with its own title: the one with files (its scan state), else one with
+    # tags, else the oldest. It takes over the others' tags and, if it has none, their poster.
+    groups = {}
+    for movie_id, folder_path, poster_path, has_files, has_tags in conn.execute("""
+            SELECT id, folder_path, poster_path,
+                   EXISTS (SELECT 1 FROM files f WHERE f.movie_id = m.id),
+                   EXISTS (SELECT 1 FROM movie_tags mt WHERE mt.movie_id = m.id)
+            FROM movies m ORDER BY id""").fetchall():
+        groups.setdefault(normalize_path(folder_path), []).append(
+            (movie_id, folder_path, poster_path, has_files, has_tags))
+    renamed = []
+    for normalized, rows in groups.items():
+        kept = min(rows, key=lambda row: (not row[3], not row[4], row[0]))
+        for movie_id, _, poster_path, _, _ in rows:
+            if movie_id == kept[0]:
+                continue
+            conn.execute("INSERT OR IGNORE INTO movie_tags (movie_id, tag_id) SELECT ?, tag_id FROM movie_tags "
+                         "WHERE movie_id = ?", (kept[0], movie_id))
+            if poster_path:
+                conn.execute("UPDATE movies SET poster_path = ? WHERE id = ? AND poster_path IS NULL",
+                             (poster_path, kept[0]))
+            conn.execute("DELETE FROM movies WHERE id = ?", (movie_id,))
+        if kept[1] != normalized:
+            renamed.append((normalized, kept[0]))
+    # Only after the duplicates are gone: any other title with the new path would have been one of them
+    conn.executemany("UPDATE movies SET folder_path = ? WHERE id = ?", renamed)
+    conn.executemany("UPDATE files SET file_path = ? WHERE id = ?",
+                     [(normalize_path(file_path), file_id) for file_id, file_path
+                      in conn.execute("SELECT id, file_path FROM files").fetchall()
+                      if normalize_path(file_path) != file_path])
+    conn.executemany("UPDATE OR REPLACE folder_state SET dir_path = ? WHERE dir_path = ?",
+                     [(normalize_path(dir_path), dir_path) for dir_path,
+                      in conn.execute("SELECT dir_path FROM folder_state").fetchall()
+                      if normalize_path(dir_path) != dir_path])
+
+# Applied in order; PRAGMA user_version records how many have run. Only ever append to this list.
+MIGRATIONS = [
+    _migration_1_base_schema,
+    _migration_2_secondary_indexes,
+    _migration_3_full_text_search,
+    _migration_4_file_kinds,
+    _migration_5_change_counter,
+    _migration_6_normalized_paths,
+]
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def init_db():
+    conn = get_connection()
+    # WAL is persistent in the database file, so it only has to be switched on once
+    conn.execute("PRAGMA journal_mode = WAL")
+    version = get_schema_version()
+    if version > len(MIGRATIONS):
+        raise RuntimeError(f"Database schema version {version} is newer than this application supports "
+                           f"({len(MIGRATIONS)}).")
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        # Each step commits together with its version bump, so a failed migration leaves the previous version
+        with transaction() as conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        print(f"Database migrated to schema version {number} ({migration.__name__}).")
+
+def _filtered_movies_query(num_tags):
+    return f"""
+        SELECT m.id, m.title, m.folder_path FROM movies m
+        JOIN movie_tags mt ON m.id = mt.movie_id
+        JOIN tags t ON mt.tag_id = t.id
+        WHERE t.name IN ({','.join(['?']*num_tags)})
+        GROUP BY m.id HAVING COUNT(DISTINCT t.id) = ?
+        ORDER BY m.title ASC
+    """
 
 def get_filtered_movies(selected_tags=None):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
+    conn = get_connection()
     if not selected_tags:
-        cursor.execute("SELECT id, title, folder_path FROM movies ORDER BY title ASC")
-    else:
+        return conn.execute(ALL_MOVIES_QUERY).fetchall()
+    tags_tuple = tuple(selected_tags)
+    num_tags = len(tags_tuple)
+    params = tags_tuple + (num_tags,)
+    return conn.execute(_filtered_movies_query(num_tags), params).fetchall()
+
+def get_movie_summaries(selected_tags=None):
+    # Everything the list, grid and preview need for a result set, in a single query
+    query = """
+        SELECT m.id, m.title, m.folder_path, m.poster_path, m.content_type,
+               (SELECT group_concat(name, char(31)) FROM (
+                    SELECT t.name FROM movie_tags mt JOIN tags t ON t.id = mt.tag_id
+                    WHERE mt.movie_id = m.id ORDER BY t.name))
+        FROM movies m
+    """
+    params = ()
+    if selected_tags:
         tags_tuple = tuple(selected_tags)
-        num_tags = len(tags_tuple)
-        query = f"""
-            SELECT m.id, m.title, m.folder_path FROM movies m
-            JOIN movie_tags mt ON m.id = mt.movie_id
-            JOIN tags t ON mt.tag_id = t.id
-            WHERE t.name IN ({','.join(['?']*num_tags)})
-            GROUP BY m.id HAVING COUNT(DISTINCT t.id) = ?
-            ORDER BY m.title ASC
+        query += f"""
+        WHERE m.id IN (
+            SELECT mt.movie_id FROM movie_tags mt JOIN tags t ON mt.tag_id = t.id
+            WHERE t.name IN ({','.join(['?']*len(tags_tuple))})
+            GROUP BY mt.movie_id HAVING COUNT(DISTINCT t.id) = ?)
         """
-        params = tags_tuple + (num_tags,)
-        cursor.execute(query, params)
-    movies = cursor.fetchall()
-    conn.close()
-    return movies
+        params = tags_tuple + (len(tags_tuple),)
+    query += " ORDER BY m.title ASC"
+    return [{"id": row[0], "title": row[1], "folder_path": row[2], "poster_path": row[3], "content_type": row[4],
+             "tags": row[5].split("\x1f") if row[5] else []}
+            for row in get_connection().execute(query, params)]
+
+def build_search_query(text):
+    """Turn free text into an FTS5 query in which every word must match as a prefix.
+
+    Words are quoted so FTS5 operators typed by the user are searched for literally.
+    Returns None if the text has no searchable words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_movie_ids(text):
+    # Titles whose name, or the name of one of their files, matches the text; None means "no search"
+    query = build_search_query(text)
+    if query is None:
+        return None
+    conn = get_connection()
+    return [row[0] for row in conn.execute(SEARCH_QUERY, (query, query))]
+
+def _movie_files_page_query(filter_kind):
+    # Keyset pagination: the next page starts after the last path of the previous one, so with a kind every
+    # page is a short range scan of idx_files_movie_kind_path however deep the user has scrolled
+    query = "SELECT file_path FROM files WHERE movie_id = ?"
+    if filter_kind:
+        query += " AND kind = ?"
+    return query + " AND file_path > ? ORDER BY file_path ASC LIMIT ?"
+
+def get_movie_files_page(movie_id, after_path="", limit=FILES_PAGE_SIZE, kind=None):
+    """Return up to limit file paths of a title, in path order, that sort after after_path.
+
+    If kind is given ('video', 'image', 'subtitle' or 'other'), only files of that kind are returned.
+    """
+    params = (movie_id, kind, after_path, limit) if kind else (movie_id, after_path, limit)
+    return [row[0] for row in get_connection().execute(_movie_files_page_query(bool(kind)), params)]
+
+def get_movie_file_stats(movie_id):
+    # kind -> {"count", "size"} for one title
+    return {kind: {"count": count, "size": size or 0}
+            for kind, count, size in get_connection().execute(MOVIE_FILE_STATS_QUERY, (movie_id,))}
+
+def get_library_sizes():
+    """Return movie_id -> (file_count, total_bytes) for every title that has files."""
+    return {movie_id: (count, size or 0) for movie_id, count, size in get_connection().execute(LIBRARY_SIZES_QUERY)}
+
+def get_movie_ids_without_videos():
+    # Video titles whose folders hold no video files at all, e.g. after the files were moved away
+    return [row[0] for row in get_connection().execute(MOVIES_WITHOUT_VIDEOS_QUERY)]
 
 def get_tags_for_movie(movie_id):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    query = "SELECT t.name FROM tags t JOIN movie_tags mt ON t.id = mt.tag_id WHERE mt.movie_id = ? ORDER BY t.name"
-    cursor.execute(query, (movie_id,))
-    tags = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return tags
+    return [row[0] for row in get_connection().execute(MOVIE_TAGS_QUERY, (movie_id,))]
 
 def get_all_tags():
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM tags ORDER BY name")
-    all_tags = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return all_tags
+    return [row[0] for row in get_connection().execute("SELECT name FROM tags ORDER BY name")]
+
+def get_tag_index():
+    if not tag_index.loaded:
+        tag_index.load(get_connection())
+    return tag_index
+
+def add_tag_listener(listener):
+    # Tag events (see TagIndex) for the changes made through this module
+    tag_index.add_listener(listener)
+
+def remove_tag_listener(listener):
+    tag_index.remove_listener(listener)
+
+def prime_tag_index(tag_bits, all_movies):
+    # Fills the index from the startup snapshot before the database has been opened
+    tag_index.load_bits(tag_bits, all_movies)
+
+def get_tag_bits():
+    # For a background thread: the bitsets are handed to prime_tag_index on the UI thread
+    return read_tag_bits(get_connection())
+
+def reload_tag_index():
+    # Replaces whatever the index holds (e.g. bitsets from the startup snapshot) with the database state
+    tag_index.load(get_connection())
+    return tag_index
+
+def get_change_counter():
+    row = get_connection().execute("SELECT value FROM library_state WHERE key = 'change_counter'").fetchone()
+    return row[0] if row else 0
 
 def add_new_tag(tag_name):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag_name.strip(),))
-    conn.commit()
-    conn.close()
+    get_connection().execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag_name.strip(),))
+    tag_index.add_tag(tag_name.strip())
 
 def assign_tag_to_movie(movie_id, tag_name):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR IGNORE INTO movie_tags (movie_id, tag_id) SELECT ?, id FROM tags WHERE name = ?", (movie_id, tag_name))
-    conn.commit()
-    conn.close()
+    cursor = get_connection().execute("INSERT OR IGNORE INTO movie_tags (movie_id, tag_id) SELECT ?, id FROM tags WHERE name = ?", (movie_id, tag_name))
+    if cursor.rowcount:
+        tag_index.assign(movie_id, tag_name)
 
 def remove_tag_from_movie(movie_id, tag_name):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM movie_tags WHERE movie_id = ? AND tag_id = (SELECT id FROM tags WHERE name = ?)", (movie_id, tag_name))
-    conn.commit()
-    conn.close()
+    cursor = get_connection().execute("DELETE FROM movie_tags WHERE movie_id = ? AND tag_id = (SELECT id FROM tags WHERE name = ?)", (movie_id, tag_name))
+    if cursor.rowcount:
+        tag_index.unassign(movie_id, tag_name)
+
+def assign_tag_to_movies(movie_ids, tag_name):
+    """Give a tag to many titles in one transaction; returns how many of them did not have it yet."""
+    movie_ids = list(movie_ids)
+    with transaction() as conn:
+        row = conn.execute("SELECT id FROM tags WHERE name = ?", (tag_name,)).fetchone()
+        if row is None:
+            return 0
+        # rowcount, not total_changes: the change counter triggers would be counted too
+        changed = conn.executemany("INSERT OR IGNORE INTO movie_tags (movie_id, tag_id) VALUES (?, ?)",
+                                   [(movie_id, row[0]) for movie_id in movie_ids]).rowcount
+    tag_index.assign_many(movie_ids, tag_name)
+    return changed
+
+def remove_tag_from_movies(movie_ids, tag_name):
+    """Take a tag away from many titles in one transaction; returns how many of them had it."""
+    movie_ids = list(movie_ids)
+    with transaction() as conn:
+        row = conn.execute("SELECT id FROM tags WHERE name = ?", (tag_name,)).fetchone()
+        if row is None:
+            return 0
+        # rowcount, not total_changes: the change counter triggers would be counted too
+        changed = conn.executemany("DELETE FROM movie_tags WHERE movie_id = ? AND tag_id = ?",
+                                   [(movie_id, row[0]) for movie_id in movie_ids]).rowcount
+    tag_index.unassign_many(movie_ids, tag_name)
+    return changed
+
+def check_query_plans():
+    """Run EXPLAIN QUERY PLAN on the hot queries and report whether each one uses its intended index.
+
+    Returns a list of (name, ok, plan_lines).
+    """
+    conn = get_connection()
+    checks = [
+        ("filter by tags", _filtered_movies_query(2), ("a", "b", 2), ("idx_movie_tags_tag_id",)),
+        ("title order", ALL_MOVIES_QUERY, (), ("idx_movies_title",)),
+        ("details files", _movie_files_page_query(True), (1, "video", "", FILES_PAGE_SIZE),
+         ("COVERING INDEX idx_files_movie_kind_path",)),
+        ("title file stats", MOVIE_FILE_STATS_QUERY, (1,), ("COVERING INDEX idx_files_movie_kind_size",)),
+        ("library sizes", LIBRARY_SIZES_QUERY, (), ("COVERING INDEX idx_files_movie_kind_size",)),
+        ("titles without videos", MOVIES_WITHOUT_VIDEOS_QUERY, (), ("(movie_id=? AND kind=?)",)),
+        ("details tags", MOVIE_TAGS_QUERY, (1,), ("sqlite_autoindex_movie_tags_1",)),
+    ]
+    results = []
+    for name, query, params, expected in checks:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+        ok = all(any(fragment in line for line in plan) for fragment in expected)
+        # A full table scan of files/movie_tags or a sort on the title column means an index is being missed
+        ok = ok and not any(line.startswith(("SCAN files", "SCAN mt")) and "COVERING INDEX" not in line
+                            for line in plan)
+        ok = ok and not any("TEMP B-TREE FOR ORDER BY" in line for line in plan if name == "title order")
+        results.append((name, ok, plan))
+    return results
 
 def get_movie_details(movie_id):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT title, folder_path, poster_path, content_type FROM movies WHERE id = ?", (movie_id,))
-    movie_data = cursor.fetchone()
+    conn = get_connection()
+    movie_data = conn.execute("SELECT title, folder_path, poster_path, content_type FROM movies WHERE id = ?", (movie_id,)).fetchone()
     if not movie_data:
-        conn.close()
         return None
-    details = {"title": movie_data[0], "folder_path": movie_data[1], "poster_path": movie_data[2], "content_type": movie_data[3], "files": [], "tags": get_tags_for_movie(movie_id)}
-    if details["content_type"] == 'video':
-        cursor.execute("SELECT file_path FROM files WHERE movie_id = ? ORDER BY file_path ASC", (movie_id,))
-        details["files"] = [file[0] for file in cursor.fetchall()]
-    conn.close()
+    # Files are not included: the details panel pages through them with get_movie_files_page
+    details = {"title": movie_data[0], "folder_path": movie_data[1], "poster_path": movie_data[2], "content_type": movie_data[3], "tags": get_tags_for_movie(movie_id)}
     return details
 
 def update_movie_poster(movie_id, poster_path):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("UPDATE movies SET poster_path = ? WHERE id = ?", (poster_path, movie_id))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    old = conn.execute("SELECT poster_path FROM movies WHERE id = ?", (movie_id,)).fetchone()
+    conn.execute("UPDATE movies SET poster_path = ? WHERE id = ?", (poster_path, movie_id))
+    # The new poster is usually copied over the old file, so cached decodes of both paths are stale
+    if old:
+        invalidate_poster(old[0])
+    invalidate_poster(poster_path)
 
 def update_movie_content_type(movie_id, new_type):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("UPDATE movies SET content_type = ? WHERE id = ?", (new_type, movie_id))
-    conn.commit()
-    conn.close()
+    get_connection().execute("UPDATE movies SET content_type = ? WHERE id = ?", (new_type, movie_id))
 
 def rename_tag(old_name, new_name):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
     new_name = new_name.strip()
     if not new_name:
-        conn.close()
         return
     try:
-        cursor.execute("UPDATE tags SET name = ? WHERE name = ?", (new_name, old_name))
-        conn.commit()
+        get_connection().execute("UPDATE tags SET name = ? WHERE name = ?", (new_name, old_name))
+        tag_index.rename(old_name, new_name)
         print(f"Tag '{old_name}' renamed to '{new_name}'.")
     except sqlite3.IntegrityError:
         print(f"Error: A tag with the name '{new_name}' already exists.")
-    finally:
-        conn.close()
 
 def delete_tag(tag_name):
-    conn = sqlite3.connect('data/library.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM tags WHERE name = ?", (tag_name,))
-    conn.commit()
-    conn.close()
+    get_connection().execute("DELETE FROM tags WHERE name = ?", (tag_name,))
+    tag_index.remove_tag(tag_name)
     print(f"Tag '{tag_name}' and all its associations have been deleted.")
 
 if __name__ == '__main__':
+    import sys
     if not os.path.exists('data'): os.makedirs('data')
     if not os.path.exists('data/posters'): os.makedirs('data/posters')
-    init_db()
\ No newline at end of file
+    init_db()
+    if '--check-plans' in sys.argv:
+        all_ok = True
+        for name, ok, plan in check_query_plans():
+            all_ok = all_ok and ok
+            print(f"[{'OK' if ok else 'FAIL'}] {name}")
+            for line in plan: print(f"    {line}")
+        sys.exit(0 if all_ok else 1)
\ No newline at end of file
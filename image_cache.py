@@ -0,0 +1,78 @@
+# image_cache.py
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+class ImageCache:
+    # LRU cache of decoded images with a byte budget. Keys are (poster_path, size) tuples,
+    # values are whatever put() was given together with its approximate size in bytes.
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+
+    def invalidate(self, poster_path):
+        # Drops every size variant of one poster
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == poster_path]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.current_bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+
+
+# Shared by every poster render path in the process
+poster_cache = ImageCache()
+
+
+def invalidate_poster(poster_path):
+    if poster_path:
+        poster_cache.invalidate(poster_path)
@@ -0,0 +1,159 @@
+# library_snapshot.py
+# Compact copy of what the title list needs (ids, titles, folders, posters, types, tags and tag bitsets),
+# so the first screen can be drawn on startup without opening SQLite.
+#
+# File layout: a header, then sections of (typecode, byte length, bytes). Numbers are little-endian arrays,
+# strings are UTF-8, each one ended by NUL, which cannot occur in paths or in titles taken from folder names.
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from tag_index import bitset_from_ids
+
+SNAPSHOT_PATH = os.path.join('data', 'library.snapshot')
+MAGIC = b'MLSNAP\x00\x01'
+_HEADER = struct.Struct('<8sqII')  # magic, change counter, movie count, tag count
+_SECTION = struct.Struct('<cQ')  # typecode (b'S' for strings), byte length
+_SEPARATOR = '\x00'
+
+
+class LibrarySnapshot:
+    def __init__(self, change_counter, movies, tag_names, tag_bits, all_movies):
+        self.change_counter = change_counter
+        self.movies = movies  # the same dicts get_movie_summaries returns, in title order
+        self.tag_names = tag_names  # sorted like get_all_tags
+        self.tag_bits = tag_bits  # tag name -> bitset of movie ids, as in TagIndex
+        self.all_movies = all_movies
+
+
+def _pack_numbers(typecode, values):
+    numbers = array(typecode, values)
+    if sys.byteorder != 'little':
+        numbers.byteswap()
+    data = numbers.tobytes()
+    return _SECTION.pack(typecode.encode(), len(data)) + data
+
+
+def _pack_strings(strings):
+    data = ''.join(string + _SEPARATOR for string in strings).encode('utf-8')
+    return _SECTION.pack(b'S', len(data)) + data
+
+
+def _pack_blob(data):
+    return _SECTION.pack(b'B', len(data)) + data
+
+
+def write_snapshot(change_counter, movies, tag_names, tag_bits, path=SNAPSHOT_PATH):
+    content_types = sorted({movie["content_type"] for movie in movies})
+    type_numbers = {content_type: number for number, content_type in enumerate(content_types)}
+    tag_numbers = {name: number for number, name in enumerate(tag_names)}
+    tag_offsets = [0]
+    movie_tags = []
+    for movie in movies:
+        movie_tags.extend(tag_numbers[tag] for tag in movie["tags"])
+        tag_offsets.append(len(movie_tags))
+    bitsets = [tag_bits.get(name, 0).to_bytes((tag_bits.get(name, 0).bit_length() + 7) // 8, 'little')
+               for name in tag_names]
+    bitset_offsets = [0]
+    for bitset in bitsets:
+        bitset_offsets.append(bitset_offsets[-1] + len(bitset))
+    parts = [
+        _HEADER.pack(MAGIC, change_counter, len(movies), len(tag_names)),
+        _pack_numbers('q', [movie["id"] for movie in movies]),
+        _pack_strings(movie["title"] for movie in movies),
+        _pack_strings(movie["folder_path"] for movie in movies),
+        _pack_strings(movie["poster_path"] or "" for movie in movies),
+        _pack_strings(content_types),
+        _pack_numbers('B', [type_numbers[movie["content_type"]] for movie in movies]),
+        _pack_strings(tag_names),
+        _pack_numbers('I', tag_offsets),
+        _pack_numbers('I', movie_tags),
+        _pack_numbers('Q', bitset_offsets),
+        _pack_blob(b''.join(bitsets)),
+    ]
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # A unique temporary name: the background writer and the one on exit may run at the same time
+    with tempfile.NamedTemporaryFile('wb', dir=directory, prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+        try:
+            f.writelines(parts)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+
+def _read_sections(view, offset):
+    while offset < len(view):
+        typecode, length = _SECTION.unpack_from(view, offset)
+        offset += _SECTION.size
+        data = view[offset:offset + length]
+        if len(data) != length:
+            raise ValueError("truncated snapshot")
+        offset += length
+        if typecode == b'S':
+            yield str(data, 'utf-8').split(_SEPARATOR)[:-1]
+        elif typecode == b'B':
+            yield bytes(data)
+        else:
+            numbers = array(typecode.decode())
+            numbers.frombytes(data)
+            if sys.byteorder != 'little':
+                numbers.byteswap()
+            yield numbers
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Read a snapshot written by write_snapshot; None if there is none or it cannot be used."""
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return _parse(view)
+            finally:
+                view.release()
+    except (OSError, ValueError, struct.error, IndexError, BufferError):
+        return None
+
+
+def _parse(view):
+    magic, change_counter, movie_count, tag_count = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("not a library snapshot")
+    (ids, titles, folders, posters, content_types, type_numbers, tag_names, tag_offsets, movie_tags,
+     bitset_offsets, bitsets) = _read_sections(view, _HEADER.size)
+    if not (len(ids) == len(titles) == len(folders) == len(posters) == len(type_numbers) == movie_count
+            and len(tag_names) == tag_count and len(tag_offsets) == movie_count + 1):
+        raise ValueError("inconsistent snapshot")
+    movie_tags = [tag_names[number] for number in movie_tags]
+    tag_offsets = tag_offsets.tolist()
+    tags = [movie_tags[start:end] for start, end in zip(tag_offsets, tag_offsets[1:])]
+    types = [content_types[number] for number in type_numbers]
+    movies = [{"id": movie_id, "title": title, "folder_path": folder, "poster_path": poster or None,
+               "content_type": content_type, "tags": movie_tag_names}
+              for movie_id, title, folder, poster, content_type, movie_tag_names
+              in zip(ids.tolist(), titles, folders, posters, types, tags)]
+    tag_bits = {name: int.from_bytes(bitsets[bitset_offsets[i]:bitset_offsets[i + 1]], 'little')
+                for i, name in enumerate(tag_names)}
+    return LibrarySnapshot(change_counter, movies, tag_names, tag_bits, bitset_from_ids(ids))
+
+
+def build_snapshot_from_database(path=SNAPSHOT_PATH):
+    """Write a fresh snapshot from the database; returns the change counter it was built at."""
+    from database import transaction, get_change_counter, get_movie_summaries, get_all_tags
+    from tag_index import TagIndex
+    # One read transaction, so the counter matches the rows that were read
+    with transaction() as conn:
+        change_counter = get_change_counter()
+        movies = get_movie_summaries()
+        tag_names = get_all_tags()
+        index = TagIndex()
+        index.load(conn)
+    write_snapshot(change_counter, movies, tag_names, index.tag_bits, path)
+    return change_counter
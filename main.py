@@ -1,22 +1,90 @@
 # main.py
+import time
+
+_process_started = time.perf_counter()  # отсчёт для --profile-startup
+
 import customtkinter as ctk
 import os
-import subprocess
 import sys
-from tkinter import filedialog
-import shutil
-import sqlite3
-from database import (get_filtered_movies, get_movie_details, update_movie_poster,
+from database import (get_movie_summaries, get_movie_details, update_movie_poster,
                       update_movie_content_type, get_all_tags, get_tags_for_movie,
-                      add_new_tag, assign_tag_to_movie, remove_tag_from_movie,
-                      rename_tag, delete_tag)
+                      add_new_tag, assign_tag_to_movie, remove_tag_from_movie, assign_tag_to_movies,
+                      remove_tag_from_movies, rename_tag, delete_tag, get_tag_index, build_search_query,
+                      search_movie_ids, get_movie_files_page, get_movie_file_stats, FILES_PAGE_SIZE, init_db,
+                      transaction, get_change_counter, get_tag_bits, prime_tag_index, add_tag_listener,
+                      remove_tag_listener, close_connection)
+from classifier import FILE_KIND_VIDEO
+from image_cache import poster_cache
+from library_snapshot import load_snapshot, build_snapshot_from_database
+from poster_loader import PosterLoader, PRIORITY_DETAILS, PRIORITY_PREVIEW, PRIORITY_VISIBLE, PRIORITY_PREFETCH
+from tag_index import bitset_contains, bitset_from_ids, ids_from_bitset
+from thumbnails import THUMBNAIL_SIZES, generate_thumbnails, get_thumbnail_path
+from ui_widgets import VirtualList, VirtualGrid
 from PIL import Image
+import bisect
 import functools
+import heapq
+# scanner, subprocess, shutil, tkinter.filedialog and concurrent.futures are imported where they are first needed,
+# so they do not delay the first window; PIL cannot be deferred because customtkinter imports it itself
+
+LIST_ROW_HEIGHT = 40
+FILE_ROW_HEIGHT = 26
+EXCLUDED_TAG_COLOR = "#E74C3C"
+GRID_TILE_SIZE = (120, 210)
+SCAN_POLL_INTERVAL_MS = 100
+SCAN_LIST_REFRESH_INTERVAL_MS = 1000
+SEARCH_DEBOUNCE_MS = 250
+BACKGROUND_POLL_INTERVAL_MS = 20
+SNAPSHOT_WRITE_DELAY_MS = 2000
+PREVIEW_DELAY_MS = 200
+SHIFT_MASK = 0x1
+# Ctrl-клик; на macOS выделяют через Command
+CONTROL_MASK = (0x4 | 0x8) if sys.platform == "darwin" else 0x4
+
+
+def format_size(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+class StartupProfile:
+    # Timestamps of the startup phases, measured from the start of main.py; printed with --profile-startup
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+
+    def mark(self, phase):
+        if self.enabled:
+            self.phases.append((phase, time.perf_counter() - _process_started))
+
+    def report(self):
+        if not self.enabled:
+            return
+        previous = 0.0
+        print("Startup profile (ms since main.py started, ms in phase):")
+        for phase, elapsed in self.phases:
+            print(f"  {elapsed * 1000:8.1f} {(elapsed - previous) * 1000:8.1f}  {phase}")
+            previous = elapsed
+
+
+def decode_poster_thumbnail(poster_path, variant):
+    # Читаем уменьшенную копию из data/posters/thumbs вместо исходного файла; без Tk, можно звать из фонового потока
+    thumbnail_path = get_thumbnail_path(poster_path, variant)
+    if thumbnail_path is None:
+        raise ValueError(f"Could not create a thumbnail for {poster_path}")
+    pil_image = Image.open(thumbnail_path)
+    pil_image.load()
+    return pil_image
+
 
-IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.gif']
-VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm')
-IMAGE_FILE_COUNT_THRESHOLD = 30
-IMAGE_PERCENTAGE_THRESHOLD = 0.8
+def make_poster_image(pil_image, size):
+    # (image, nbytes) for poster_cache
+    nbytes = pil_image.width * pil_image.height * len(pil_image.getbands())
+    return ctk.CTkImage(pil_image, size=size), nbytes
 
 
 def create_placeholder_image_if_not_exists():
@@ -30,6 +98,15 @@ def create_placeholder_image_if_not_exists():
     return placeholder_path
 
 
+def pack_in_order(widgets, name, widget, **pack_options):
+    # Packs widget so that the names in widgets (name -> packed widget) stay sorted, as get_all_tags returns them
+    following = min((other for other in widgets if other > name), default=None)
+    if following is None:
+        widget.pack(**pack_options)
+    else:
+        widget.pack(before=widgets[following], **pack_options)
+
+
 class EditTagDialog(ctk.CTkInputDialog):
     def __init__(self, *args, initial_value="", **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,43 +132,69 @@ class TagEditorWindow(ctk.CTkToplevel):
         self.available_tags_frame.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
         self.assigned_tags_frame = ctk.CTkScrollableFrame(self, label_text="Assigned Tags (Click to remove)")
         self.assigned_tags_frame.grid(row=2, column=1, padx=10, pady=10, sticky="nsew")
+        self.available_buttons = {}
+        self.assigned_buttons = {}
         self.protocol("WM_DELETE_WINDOW", self._on_close)
-        self.refresh_tag_lists()
+        assigned_tags = set(get_tags_for_movie(self.movie_id))
+        for tag in get_all_tags():
+            self._show_tag(tag, tag in assigned_tags, append=True)
+        # Дальше списки правятся по событиям тегов, без перестроения
+        add_tag_listener(self._on_tag_event)
 
-    def refresh_tag_lists(self):
-        for widget in self.available_tags_frame.winfo_children(): widget.destroy()
-        for widget in self.assigned_tags_frame.winfo_children(): widget.destroy()
-        all_tags = get_all_tags()
-        assigned_tags = get_tags_for_movie(self.movie_id)
-        for tag in all_tags:
-            if tag not in assigned_tags:
-                btn = ctk.CTkButton(self.available_tags_frame, text=tag, fg_color="gray",
-                                    command=lambda t=tag: self._add_tag(t))
-                btn.pack(pady=2, padx=5, fill="x")
-        for tag in assigned_tags:
-            btn = ctk.CTkButton(self.assigned_tags_frame, text=tag, fg_color="#C0392B", hover_color="#E74C3C",
-                                command=lambda t=tag: self._remove_tag(t))
+    def _show_tag(self, tag, assigned, append=False):
+        if assigned:
+            buttons = self.assigned_buttons
+            btn = ctk.CTkButton(self.assigned_tags_frame, text=tag, fg_color="#C0392B", hover_color="#E74C3C")
+            btn.configure(command=lambda: self._remove_tag(btn.tag_name))
+        else:
+            buttons = self.available_buttons
+            btn = ctk.CTkButton(self.available_tags_frame, text=tag, fg_color="gray")
+            btn.configure(command=lambda: self._add_tag(btn.tag_name))
+        btn.tag_name = tag
+        if append:
             btn.pack(pady=2, padx=5, fill="x")
+        else:
+            pack_in_order(buttons, tag, btn, pady=2, padx=5, fill="x")
+        buttons[tag] = btn
+
+    def _hide_tag(self, tag):
+        for buttons in (self.available_buttons, self.assigned_buttons):
+            if tag in buttons:
+                buttons.pop(tag).destroy()
+
+    def _on_tag_event(self, event):
+        kind, tag, bits = event[:3]
+        if kind == "added":
+            self._show_tag(tag, False)
+        elif kind == "removed":
+            self._hide_tag(tag)
+        elif kind == "renamed":
+            new_tag = event[3]
+            buttons = self.assigned_buttons if tag in self.assigned_buttons else self.available_buttons
+            btn = buttons.pop(tag)
+            btn.tag_name = new_tag
+            btn.configure(text=new_tag)
+            btn.pack_forget()
+            pack_in_order(buttons, new_tag, btn, pady=2, padx=5, fill="x")
+            buttons[new_tag] = btn
+        elif bits >> self.movie_id & 1:  # assigned / unassigned
+            self._hide_tag(tag)
+            self._show_tag(tag, kind == "assigned")
 
     def _add_tag(self, tag_name):
         assign_tag_to_movie(self.movie_id, tag_name)
-        self.refresh_tag_lists()
 
     def _remove_tag(self, tag_name):
         remove_tag_from_movie(self.movie_id, tag_name)
-        self.refresh_tag_lists()
 
     def _create_new_tag(self):
         new_tag = self.new_tag_entry.get().strip()
         if new_tag:
             add_new_tag(new_tag)
             self.new_tag_entry.delete(0, "end")
-            self.refresh_tag_lists()
 
     def _on_close(self):
-        self.master_app.populate_sidebar_tags()
-        if self.master_app.current_selected_movie_id:
-            self.master_app.show_movie_details(self.master_app.current_selected_movie_id)
+        remove_tag_listener(self._on_tag_event)
         self.destroy()
 
 
@@ -108,42 +211,163 @@ class GlobalTagManagerWindow(ctk.CTkToplevel):
         self.scrollable_frame = ctk.CTkScrollableFrame(self, label_text="All Tags")
         self.scrollable_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         self.scrollable_frame.grid_columnconfigure(0, weight=1)
+        self.tag_rows = {}
         self.protocol("WM_DELETE_WINDOW", self._on_close)
-        self.refresh_list()
-
-    def refresh_list(self):
-        for widget in self.scrollable_frame.winfo_children(): widget.destroy()
         for tag_name in get_all_tags():
-            row_frame = ctk.CTkFrame(self.scrollable_frame, fg_color="transparent")
+            self._add_row(tag_name, append=True)
+        add_tag_listener(self._on_tag_event)
+
+    def _add_row(self, tag_name, append=False):
+        row_frame = ctk.CTkFrame(self.scrollable_frame, fg_color="transparent")
+        row_frame.tag_name = tag_name
+        row_frame.grid_columnconfigure(0, weight=1)
+        row_frame.label = ctk.CTkLabel(row_frame, text=tag_name)
+        row_frame.label.grid(row=0, column=0, padx=5, sticky="w")
+        delete_button = ctk.CTkButton(row_frame, text="Delete", width=60, fg_color="#D35400", hover_color="#E67E22",
+                                      command=lambda: self._delete_tag(row_frame.tag_name))
+        delete_button.grid(row=0, column=2, padx=5)
+        edit_button = ctk.CTkButton(row_frame, text="Edit", width=60,
+                                    command=lambda: self._edit_tag(row_frame.tag_name))
+        edit_button.grid(row=0, column=1, padx=5)
+        if append:
             row_frame.pack(fill="x", pady=2, padx=5)
-            row_frame.grid_columnconfigure(0, weight=1)
-            label = ctk.CTkLabel(row_frame, text=tag_name)
-            label.grid(row=0, column=0, padx=5, sticky="w")
-            delete_button = ctk.CTkButton(row_frame, text="Delete", width=60, fg_color="#D35400", hover_color="#E67E22",
-                                          command=lambda name=tag_name: self._delete_tag(name))
-            delete_button.grid(row=0, column=2, padx=5)
-            edit_button = ctk.CTkButton(row_frame, text="Edit", width=60,
-                                        command=lambda name=tag_name: self._edit_tag(name))
-            edit_button.grid(row=0, column=1, padx=5)
+        else:
+            pack_in_order(self.tag_rows, tag_name, row_frame, fill="x", pady=2, padx=5)
+        self.tag_rows[tag_name] = row_frame
+
+    def _on_tag_event(self, event):
+        kind, tag_name = event[:2]
+        if kind == "added":
+            self._add_row(tag_name)
+        elif kind == "removed":
+            self.tag_rows.pop(tag_name).destroy()
+        elif kind == "renamed":
+            new_name = event[3]
+            row_frame = self.tag_rows.pop(tag_name)
+            row_frame.tag_name = new_name
+            row_frame.label.configure(text=new_name)
+            row_frame.pack_forget()
+            pack_in_order(self.tag_rows, new_name, row_frame, fill="x", pady=2, padx=5)
+            self.tag_rows[new_name] = row_frame
 
     def _edit_tag(self, old_name):
         dialog = EditTagDialog(text=f"Enter new name for tag '{old_name}':", title="Rename Tag", initial_value=old_name)
         new_name = dialog.get_input()
         if new_name and new_name.strip():
             rename_tag(old_name, new_name.strip())
-            self.refresh_list()
 
     def _delete_tag(self, tag_name):
         delete_tag(tag_name)
-        self.refresh_list()
 
     def _on_close(self):
-        self.master_app.populate_sidebar_tags()
-        if self.master_app.current_selected_movie_id:
-            self.master_app.show_movie_details(self.master_app.current_selected_movie_id)
+        remove_tag_listener(self._on_tag_event)
         self.destroy()
 
 
+class BulkTagWindow(ctk.CTkToplevel):
+    # Добавление и снятие тегов сразу у всех выделенных тайтлов, одной транзакцией на тег
+    def __init__(self, master, movie_ids):
+        super().__init__(master)
+        self.master_app = master
+        self.movie_ids = list(movie_ids)
+        self.movie_bits = bitset_from_ids(self.movie_ids)
+        self.title(f"Tag {len(self.movie_ids)} Titles")
+        self.geometry("500x600")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.grab_set()
+        self.transient(master)
+        self.new_tag_entry = ctk.CTkEntry(self, placeholder_text="Enter new tag name")
+        self.new_tag_entry.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
+        self.add_new_tag_button = ctk.CTkButton(self, text="Add New Tag to Selection",
+                                                command=lambda: self._create_new_tag())
+        self.add_new_tag_button.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        self.scrollable_frame = ctk.CTkScrollableFrame(self, label_text="Tags (titles in the selection that have it)")
+        self.scrollable_frame.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
+        self.status_label = ctk.CTkLabel(self, text="", text_color="gray")
+        self.status_label.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.tag_rows = {}
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        for tag_name in get_all_tags():
+            self._add_row(tag_name, append=True)
+        add_tag_listener(self._on_tag_event)
+
+    def _add_row(self, tag_name, append=False):
+        row_frame = ctk.CTkFrame(self.scrollable_frame, fg_color="transparent")
+        row_frame.tag_name = tag_name
+        row_frame.grid_columnconfigure(0, weight=1)
+        row_frame.label = ctk.CTkLabel(row_frame, text="")
+        row_frame.label.grid(row=0, column=0, padx=5, sticky="w")
+        remove_button = ctk.CTkButton(row_frame, text="Remove", width=70, fg_color="#C0392B", hover_color="#E74C3C",
+                                      command=lambda: self._remove_tag(row_frame.tag_name))
+        remove_button.grid(row=0, column=2, padx=5)
+        add_button = ctk.CTkButton(row_frame, text="Add", width=70,
+                                   command=lambda: self._add_tag(row_frame.tag_name))
+        add_button.grid(row=0, column=1, padx=5)
+        if append:
+            row_frame.pack(fill="x", pady=2, padx=5)
+        else:
+            pack_in_order(self.tag_rows, tag_name, row_frame, fill="x", pady=2, padx=5)
+        self.tag_rows[tag_name] = row_frame
+        self._update_row(row_frame)
+
+    def _update_row(self, row_frame):
+        count = get_tag_index().count(row_frame.tag_name, self.movie_bits)
+        row_frame.label.configure(text=f"{row_frame.tag_name} ({count}/{len(self.movie_ids)})")
+
+    def _on_tag_event(self, event):
+        kind, tag_name, bits = event[:3]
+        if kind == "added":
+            self._add_row(tag_name)
+        elif kind == "removed":
+            self.tag_rows.pop(tag_name).destroy()
+        elif kind == "renamed":
+            new_name = event[3]
+            row_frame = self.tag_rows.pop(tag_name)
+            row_frame.tag_name = new_name
+            row_frame.pack_forget()
+            pack_in_order(self.tag_rows, new_name, row_frame, fill="x", pady=2, padx=5)
+            self.tag_rows[new_name] = row_frame
+            self._update_row(row_frame)
+        elif bits & self.movie_bits:  # assigned / unassigned
+            self._update_row(self.tag_rows[tag_name])
+
+    def _add_tag(self, tag_name):
+        changed = assign_tag_to_movies(self.movie_ids, tag_name)
+        self.status_label.configure(text=f"Added '{tag_name}' to {changed} titles.")
+
+    def _remove_tag(self, tag_name):
+        changed = remove_tag_from_movies(self.movie_ids, tag_name)
+        self.status_label.configure(text=f"Removed '{tag_name}' from {changed} titles.")
+
+    def _create_new_tag(self):
+        new_tag = self.new_tag_entry.get().strip()
+        if new_tag:
+            add_new_tag(new_tag)
+            self.new_tag_entry.delete(0, "end")
+            self._add_tag(new_tag)
+
+    def _on_close(self):
+        remove_tag_listener(self._on_tag_event)
+        self.destroy()
+
+
+class ScanErrorsWindow(ctk.CTkToplevel):
+    def __init__(self, master, errors):
+        super().__init__(master)
+        self.title("Scan Errors")
+        self.geometry("600x400")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.transient(master)
+        self.errors_frame = ctk.CTkScrollableFrame(self, label_text=f"{len(errors)} folder(s) could not be imported")
+        self.errors_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        for folder_path, message in errors:
+            label = ctk.CTkLabel(self.errors_frame, text=f"{folder_path}\n{message}", anchor="w", justify="left",
+                                 wraplength=540)
+            label.pack(anchor="w", padx=5, pady=4)
+
+
 class ContextMenu(ctk.CTkFrame):
     def __init__(self, master):
         super().__init__(master, corner_radius=8)
@@ -173,17 +397,44 @@ class ContextMenu(ctk.CTkFrame):
 
 
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup_profile=None, snapshot=None):
         super().__init__()
+        self.startup_profile = startup_profile or StartupProfile(False)
+        self.startup_snapshot = snapshot
+        self.snapshot_counter = None  # счётчик изменений БД, с которого записан последний снимок
+        self.library_edits = 0  # растёт с каждой правкой из UI; фоновая загрузка библиотеки по нему видит устаревание
+        self.snapshot_write_job = None
+        self.background_executor = None
         self.current_selected_movie_id = None
         self.current_folder_path = None  # путь к папке выбранного фильма
+        self.selected_movie_ids = set()  # выделенные тайтлы (Ctrl/Shift-клик); выбранный в карточке - один из них
+        self.selection_anchor_id = None  # от него считается диапазон при Shift-клике
+        self.bulk_tag_window = None
         self.tag_editor_window = None
         self.global_tag_manager_window = None
-        self.active_filter_tags = set()
+        self.excluded_filter_tags = set()
+        self.filter_result_bits = 0
+        self.search_bits = None  # битсет тайтлов, найденных поиском; None - поиск не активен
+        self.search_after_id = None
+        self.search_generation = 0
+        self.library_movies = []  # все тайтлы из get_movie_summaries, отсортированные по названию
+        self.movie_summaries = {}  # movie_id -> строка из library_movies
         self.tag_checkboxes = {}
+        self.tag_checkbox_widgets = {}
+        add_tag_listener(self._on_tag_event)
         self.preview_window = None
         self.preview_after_id = None
+        self.preview_movie_id = None  # тайтл, для которого сейчас показана подсказка
+        self.preview_loads = {}  # poster_path -> (запрос, колбэк) миниатюр для подсказки
         self.view_mode = "list"  # режим отображения: list или grid
+        self.details_files = []  # загруженные страницы списка файлов выбранного тайтла
+        self.details_files_movie_id = None
+        self.details_files_exhausted = True
+        self.details_files_load_pending = False
+        self.scanner = None
+        self.scan_errors = []
+        self.scan_added_movies = []  # тайтлы из событий сканера, ещё не вставленные в library_movies
+        self.scan_list_refresh_after_id = None
         self.title("My Media Library")
         self.geometry("1400x750")
         self.grid_columnconfigure(1, weight=1)
@@ -199,32 +450,77 @@ class App(ctk.CTk):
         self.add_folder_button = ctk.CTkButton(self.sidebar_frame, text="Add Folder",
                                                command=lambda: self.add_folder_dialog())
         self.add_folder_button.pack(padx=20, pady=10, fill="x")
+        self.rescan_button = ctk.CTkButton(self.sidebar_frame, text="Rescan Library",
+                                           command=lambda: self.rescan_library())
+        self.rescan_button.pack(padx=20, pady=(0, 10), fill="x")
+        # Сканирование пишет в БД, поэтому кнопки включаются только после init_db (миграций) в фоне
+        self.add_folder_button.configure(state="disabled")
+        self.rescan_button.configure(state="disabled")
+        self.scan_status_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.scan_progress_bar = ctk.CTkProgressBar(self.scan_status_frame)
+        self.scan_progress_bar.pack(padx=15, pady=(0, 5), fill="x")
+        self.scan_progress_bar.set(0)
+        self.scan_status_label = ctk.CTkLabel(self.scan_status_frame, text="", font=ctk.CTkFont(size=12))
+        self.scan_status_label.pack(padx=15, anchor="w")
+        self.cancel_scan_button = ctk.CTkButton(self.scan_status_frame, text="Cancel Scan", fg_color="#D35400",
+                                                hover_color="#E67E22", command=lambda: self.cancel_scan())
+        self.cancel_scan_button.pack(padx=15, pady=5, fill="x")
+        self.show_scan_errors_button = ctk.CTkButton(self.scan_status_frame, text="Show Errors",
+                                                     command=lambda: ScanErrorsWindow(self, self.scan_errors))
         self.manage_tags_button = ctk.CTkButton(self.sidebar_frame, text="Manage Tags",
                                                 command=lambda: self.open_global_tag_manager())
         self.manage_tags_button.pack(padx=20, pady=10, fill="x")
+        self.search_entry = ctk.CTkEntry(self.sidebar_frame, placeholder_text="Search titles and files")
+        self.search_entry.pack(padx=20, pady=(10, 0), fill="x")
+        self.search_entry.bind("<KeyRelease>", self._on_search_changed)
         self.tag_filter_label = ctk.CTkLabel(self.sidebar_frame, text="Filter by Tags:",
                                              font=ctk.CTkFont(weight="bold"))
         self.tag_filter_label.pack(padx=20, pady=(10, 5), anchor="w")
+        self.tag_match_mode = ctk.StringVar(value="All")
+        self.tag_match_mode_button = ctk.CTkSegmentedButton(self.sidebar_frame, values=["All", "Any"],
+                                                            variable=self.tag_match_mode,
+                                                            command=lambda value: self.apply_filters())
+        self.tag_match_mode_button.pack(padx=20, pady=(0, 5), fill="x")
         self.tag_filter_frame = ctk.CTkScrollableFrame(self.sidebar_frame, label_text="")
         self.tag_filter_frame.pack(padx=5, pady=5, fill="both", expand=True)
         self.clear_filters_button = ctk.CTkButton(self.sidebar_frame, text="Clear Filters",
                                                   command=lambda: self.clear_filters())
         self.clear_filters_button.pack(padx=20, pady=10, side="bottom", fill="x")
-        self.movie_list_frame = ctk.CTkScrollableFrame(self, label_text="Titles")
+        self.movie_list_frame = ctk.CTkFrame(self)
         self.movie_list_frame.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+        self.movie_list_frame.grid_columnconfigure(0, weight=1)
+        self.movie_list_frame.grid_rowconfigure(1, weight=1)
+        self.movie_list_label = ctk.CTkLabel(self.movie_list_frame, text="Titles")
+        self.movie_list_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.select_all_button = ctk.CTkButton(self.movie_list_frame, text="Select All", width=90,
+                                               command=lambda: self.select_all_shown())
+        self.select_all_button.grid(row=0, column=1, pady=5, padx=5, sticky="e")
+        self.tag_selected_button = ctk.CTkButton(self.movie_list_frame, text="Tag Selected", width=110,
+                                                 state="disabled", command=lambda: self.open_bulk_tag_editor())
+        self.tag_selected_button.grid(row=0, column=2, pady=5, padx=5, sticky="e")
         self.toggle_view_button = ctk.CTkButton(self.movie_list_frame, text="Grid View", command=self.toggle_view_mode)
-        self.toggle_view_button.pack(pady=5, padx=5, anchor="ne")
-        self.grid_container = None  # контейнер для плиток
+        self.toggle_view_button.grid(row=0, column=3, pady=5, padx=5, sticky="e")
+        # Список рисует только видимые строки из небольшого пула переиспользуемых виджетов
+        self.movie_list_view = VirtualList(self.movie_list_frame, create_row=self._create_list_row,
+                                           bind_row=self._bind_list_row, row_height=LIST_ROW_HEIGHT,
+                                           key=lambda movie: movie["id"], fg_color="transparent")
+        # Сетка: число колонок зависит от ширины, постеры грузятся только для плиток в зоне видимости
+        self.movie_grid_view = VirtualGrid(self.movie_list_frame, create_row=self._create_grid_tile,
+                                           bind_row=self._bind_grid_tile, tile_width=GRID_TILE_SIZE[0],
+                                           tile_height=GRID_TILE_SIZE[1], overscan=1,
+                                           key=lambda movie: movie["id"], on_layout=self._on_grid_layout,
+                                           fg_color="transparent")
+        # Постеры декодируются в пуле потоков и отдаются в UI-поток через after(), видимые плитки - в первую очередь
+        self.poster_loader = PosterLoader(decode_poster_thumbnail, self._finish_poster, schedule=self.after)
+        self.details_poster_request = None
         self.details_frame = ctk.CTkFrame(self)
         self.details_frame.grid(row=0, column=2, padx=10, pady=10, sticky="nsew")
         self.details_frame.grid_columnconfigure(0, weight=1)
-        placeholder_path = create_placeholder_image_if_not_exists()
-        self.placeholder_image = ctk.CTkImage(Image.open(placeholder_path), size=(250, 375))
-        self.details_poster_label = ctk.CTkLabel(self.details_frame, text="No Poster", image=self.placeholder_image,
+        self.placeholder_image = None  # создаётся после первой отрисовки окна, см. _on_first_paint
+        self.details_poster_label = ctk.CTkLabel(self.details_frame, text="No Poster", width=250, height=375,
                                                  compound="center", cursor="hand2")
         self.details_poster_label.pack(pady=10, padx=10)
         self.details_poster_label.bind("<Button-3>", self.open_current_movie_folder)  # ПКМ для открытия папки
-        self.details_poster_label.image = self.placeholder_image
         self.title_string_var = ctk.StringVar()
         self.details_title_entry = ctk.CTkEntry(self.details_frame, textvariable=self.title_string_var,
                                                 font=ctk.CTkFont(size=20, weight="bold"), state="readonly",
@@ -256,182 +552,531 @@ class App(ctk.CTk):
                                               command=lambda: self.set_current_movie_as_video())
         self.set_video_button.pack(side="right", padx=5)  # Using pack
 
-        self.details_files_scrollable_frame = ctk.CTkScrollableFrame(self.details_frame, label_text="Files")
-        self.details_files_scrollable_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.details_files_frame = ctk.CTkFrame(self.details_frame)
+        self.details_files_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.details_files_label = ctk.CTkLabel(self.details_files_frame, text="Files")
+        self.details_files_label.pack(pady=(5, 0))
+        self.details_files_info_label = ctk.CTkLabel(self.details_files_frame, text="", text_color="gray")
+        # Файлы подгружаются страницами по мере прокрутки
+        self.details_files_view = VirtualList(self.details_files_frame, create_row=self._create_file_row,
+                                              bind_row=self._bind_file_row, row_height=FILE_ROW_HEIGHT,
+                                              load_more=self._on_files_list_end, fg_color="transparent")
         self.disable_details_buttons()
-        self.populate_sidebar_tags()
-        self.refresh_movie_list()
+        self.movie_list_label.configure(text="Titles (loading...)")
+        self.startup_profile.mark("window shell built")
+        # Теги и тайтлы загружаются после того, как окно уже показано
+        self.after(0, self._on_first_paint)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
         self.context_menu = ContextMenu(self)
         self.bind("<Button-1>", self.context_menu.hide)
         self.bind_all_children(self.sidebar_frame, "<Button-2>", self.open_current_movie_folder)
         self.bind("<Control-c>", self._handle_global_copy)
+        self.bind("<Escape>", self.clear_selection)
 
-    def populate_sidebar_tags(self):
+    def populate_sidebar_tags(self, all_tags=None):
+        # Полная перестройка при загрузке библиотеки; отдельные правки тегов приходят в _on_tag_event
+        checked_tags = {tag for tag, var in self.tag_checkboxes.items() if var.get() == "on"}
         for widget in self.tag_filter_frame.winfo_children(): widget.destroy()
         self.tag_checkboxes.clear()
-        all_tags = get_all_tags()
+        self.tag_checkbox_widgets.clear()
+        if all_tags is None:
+            all_tags = get_all_tags()
         for tag in all_tags:
-            var = ctk.StringVar(value="off")
-            cb = ctk.CTkCheckBox(self.tag_filter_frame, text=tag, variable=var, onvalue="on", offvalue="off",
-                                 command=lambda: self.apply_filters())
+            self._add_tag_checkbox(tag, tag in checked_tags, append=True)
+        self.excluded_filter_tags &= set(all_tags)
+        for tag in self.excluded_filter_tags:
+            self.tag_checkbox_widgets[tag].configure(text_color=EXCLUDED_TAG_COLOR)
+        self._update_tag_counts()
+
+    def _add_tag_checkbox(self, tag, checked=False, append=False):
+        var = ctk.StringVar(value="on" if checked else "off")
+        cb = ctk.CTkCheckBox(self.tag_filter_frame, text=tag, variable=var, onvalue="on", offvalue="off")
+        # Обработчики читают имя тега из виджета, поэтому переживают переименование
+        cb.tag_name = tag
+        cb.configure(command=lambda: self._on_tag_checkbox(cb.tag_name))
+        cb.bind("<Button-3>", lambda e: self.toggle_tag_exclusion(cb.tag_name))
+        if append:
             cb.pack(padx=10, pady=5, anchor="w", fill="x")
-            self.tag_checkboxes[tag] = var
+        else:
+            pack_in_order(self.tag_checkbox_widgets, tag, cb, padx=10, pady=5, anchor="w", fill="x")
+        self.tag_checkboxes[tag] = var
+        self.tag_checkbox_widgets[tag] = cb
+
+    def _on_tag_event(self, event):
+        # Правка тегов из любого окна: патчим только затронутый чекбокс, теги тайтлов в памяти и карточку
+        kind, tag, bits = event[:3]
+        if kind == "added":
+            self._add_tag_checkbox(tag)
+            self._update_tag_count(tag)
+        elif kind == "removed":
+            in_filter = self.tag_checkboxes.pop(tag).get() == "on" or tag in self.excluded_filter_tags
+            self.excluded_filter_tags.discard(tag)
+            self.tag_checkbox_widgets.pop(tag).destroy()
+            self._patch_movie_tags(bits, remove=tag)
+            if in_filter:
+                self.apply_filters()
+        elif kind == "renamed":
+            new_tag = event[3]
+            cb = self.tag_checkbox_widgets.pop(tag)
+            self.tag_checkboxes[new_tag] = self.tag_checkboxes.pop(tag)
+            if tag in self.excluded_filter_tags:
+                self.excluded_filter_tags.discard(tag)
+                self.excluded_filter_tags.add(new_tag)
+            cb.tag_name = new_tag
+            cb.pack_forget()
+            pack_in_order(self.tag_checkbox_widgets, new_tag, cb, padx=10, pady=5, anchor="w", fill="x")
+            self.tag_checkbox_widgets[new_tag] = cb
+            self._update_tag_count(new_tag)
+            self._patch_movie_tags(bits, remove=tag, add=new_tag)
+        else:
+            if kind == "assigned":
+                self._patch_movie_tags(bits, add=tag)
+            else:
+                self._patch_movie_tags(bits, remove=tag)
+            if self.tag_checkboxes[tag].get() == "on" or tag in self.excluded_filter_tags:
+                self.apply_filters()
+            else:
+                self._update_tag_count(tag)
+        movie_id = self.current_selected_movie_id
+        if movie_id is not None and bits >> movie_id & 1 and movie_id in self.movie_summaries:
+            self._show_details_tags(self.movie_summaries[movie_id]["tags"])
+        self.schedule_snapshot_write()
+
+    def _patch_movie_tags(self, bits, remove=None, add=None):
+        for movie_id in ids_from_bitset(bits):
+            movie = self.movie_summaries.get(movie_id)
+            if movie is None:
+                continue
+            tags = [tag for tag in movie["tags"] if tag != remove and tag != add]
+            if add is not None:
+                bisect.insort(tags, add)
+            movie["tags"] = tags
+
+    def _on_tag_checkbox(self, tag):
+        if self.tag_checkboxes[tag].get() == "on" and tag in self.excluded_filter_tags:
+            self.excluded_filter_tags.discard(tag)
+            self.tag_checkbox_widgets[tag].configure(text_color=ctk.ThemeManager.theme["CTkCheckBox"]["text_color"])
+        self.apply_filters()
+
+    def toggle_tag_exclusion(self, tag):
+        # ПКМ по тегу: скрыть тайтлы с этим тегом (NOT)
+        cb = self.tag_checkbox_widgets[tag]
+        if tag in self.excluded_filter_tags:
+            self.excluded_filter_tags.discard(tag)
+            cb.configure(text_color=ctk.ThemeManager.theme["CTkCheckBox"]["text_color"])
+        else:
+            self.excluded_filter_tags.add(tag)
+            self.tag_checkboxes[tag].set("off")
+            cb.configure(text_color=EXCLUDED_TAG_COLOR)
+        self.apply_filters()
 
     def apply_filters(self):
+        # Фильтрация целиком в памяти по битовому индексу тегов, без запросов к БД
         selected_tags = [tag for tag, var in self.tag_checkboxes.items() if var.get() == "on"]
-        self.refresh_movie_list(selected_tags)
+        tag_index = get_tag_index()
+        if self.tag_match_mode.get() == "Any":
+            bits = tag_index.match(any_of=selected_tags, none_of=self.excluded_filter_tags)
+        else:
+            bits = tag_index.match(all_of=selected_tags, none_of=self.excluded_filter_tags)
+        if self.search_bits is not None:
+            bits &= self.search_bits
+        self.filter_result_bits = bits
+        contains = bitset_contains(bits)
+        self.show_movies([movie for movie in self.library_movies if contains(movie["id"])])
+        if any(not contains(movie_id) for movie_id in self.selected_movie_ids):
+            # Скрытые фильтром тайтлы не должны попадать под массовые правки
+            self._set_selection({movie_id for movie_id in self.selected_movie_ids if contains(movie_id)})
+        self._update_tag_counts()
+
+    def _update_tag_counts(self):
+        counts = get_tag_index().counts(self.filter_result_bits)
+        for tag, cb in self.tag_checkbox_widgets.items():
+            text = f"{tag} ({counts.get(tag, 0)})"
+            if cb.cget("text") != text:
+                cb.configure(text=text)
+
+    def _update_tag_count(self, tag):
+        cb = self.tag_checkbox_widgets[tag]
+        text = f"{tag} ({get_tag_index().count(tag, self.filter_result_bits)})"
+        if cb.cget("text") != text:
+            cb.configure(text=text)
 
     def clear_filters(self):
         for var in self.tag_checkboxes.values(): var.set("off")
+        for tag in self.excluded_filter_tags:
+            self.tag_checkbox_widgets[tag].configure(text_color=ctk.ThemeManager.theme["CTkCheckBox"]["text_color"])
+        self.excluded_filter_tags.clear()
+        self.search_entry.delete(0, "end")
+        self.search_generation += 1
+        self.search_bits = None
+        self.apply_filters()
+
+    def _on_search_changed(self, event=None):
+        # Поиск запускается, когда пользователь перестал печатать
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DEBOUNCE_MS, self._start_search)
+
+    def _start_search(self):
+        self.search_after_id = None
+        self.search_generation += 1
+        text = self.search_entry.get()
+        if build_search_query(text) is None:
+            if self.search_bits is not None:
+                self.search_bits = None
+                self.apply_filters()
+            return
+        generation = self.search_generation
+        self._run_in_background(lambda: bitset_from_ids(search_movie_ids(text)),
+                                lambda future: self._on_search_done(generation, future))
+
+    def _on_search_done(self, generation, future):
+        if generation != self.search_generation:
+            return  # запрос устарел, пользователь уже ввёл что-то другое
+        try:
+            self.search_bits = future.result()
+        except Exception as e:
+            print(f"Search failed: {e}")
+            return
+        self.apply_filters()
+
+    def _on_first_paint(self):
+        self.update_idletasks()
+        self.startup_profile.mark("window laid out")
+        placeholder_path = create_placeholder_image_if_not_exists()
+        self.placeholder_image = ctk.CTkImage(Image.open(placeholder_path), size=(250, 375))
+        self.details_poster_label.configure(image=self.placeholder_image)
+        self.details_poster_label.image = self.placeholder_image
+        snapshot = self.startup_snapshot
+        if snapshot is not None:
+            # Первый экран рисуется из снимка, ещё до открытия SQLite
+            prime_tag_index(snapshot.tag_bits, snapshot.all_movies)
+            self._show_library(snapshot.movies, snapshot.tag_names)
+            self.snapshot_counter = snapshot.change_counter
+            self.startup_profile.mark(f"first screen shown from snapshot ({len(snapshot.movies)} titles)")
+        self._start_library_load()
+
+    def _start_library_load(self):
+        edits = self.library_edits
+        self._run_in_background(self._load_library_if_changed,
+                                functools.partial(self._on_library_loaded, edits))
+
+    def _load_library_if_changed(self):
+        # Runs on the background thread, with its own connection; None means the snapshot is up to date.
+        # Pending migrations run here too, so an upgrade of a large library does not freeze the window.
+        # Nothing shared is touched: the tag index is swapped on the UI thread in _on_library_loaded
+        init_db()
+        with transaction():
+            change_counter = get_change_counter()
+            if change_counter == self.snapshot_counter:
+                return None
+            movies = get_movie_summaries()
+            tag_bits, all_movies = get_tag_bits()
+        return change_counter, movies, tag_bits, all_movies
+
+    def _on_library_loaded(self, edits, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Could not load the library: {e}")
+            # Если уже показан снимок, оставляем его
+            result = None if self.snapshot_counter is not None else (None, [], None, 0)
+        else:
+            self.startup_profile.mark("database ready")
+            self.add_folder_button.configure(state="normal")
+            self.rescan_button.configure(state="normal")
+        if result is not None and result[0] is not None and edits != self.library_edits:
+            # Пока шла загрузка, пользователь правил теги или тайтлы: прочитанное уже устарело
+            self.startup_profile.mark("library changed during load, reading again")
+            self._start_library_load()
+            return
+        if result is None:
+            self.startup_profile.mark("snapshot is up to date")
+        else:
+            change_counter, movies, tag_bits, all_movies = result
+            self.startup_profile.mark(f"library loaded in background ({len(movies)} titles)")
+            if tag_bits is not None:
+                prime_tag_index(tag_bits, all_movies)
+            self._show_library(movies)
+            self.startup_profile.mark("first screen shown from database")
+            if change_counter is not None:
+                self._write_snapshot_in_background()
+        self.startup_profile.report()
+
+    def _show_library(self, movies, all_tags=None):
+        self._update_selection_label()
+        self.populate_sidebar_tags(all_tags)
+        self._set_library(movies)
+        self.update_idletasks()
+
+    def _write_snapshot_in_background(self):
+        self._run_in_background(build_snapshot_from_database, self._on_snapshot_written)
+
+    def schedule_snapshot_write(self):
+        # После правок тегов, постеров и типов; несколько правок подряд дают одну запись
+        self.library_edits += 1
+        if self.snapshot_write_job is not None:
+            self.after_cancel(self.snapshot_write_job)
+        self.snapshot_write_job = self.after(SNAPSHOT_WRITE_DELAY_MS, self._on_snapshot_write_due)
+
+    def _on_snapshot_write_due(self):
+        self.snapshot_write_job = None
+        self._write_snapshot_in_background()
+
+    def _on_snapshot_written(self, future):
+        try:
+            self.snapshot_counter = future.result()
+        except Exception as e:
+            print(f"Could not write the library snapshot: {e}")
+
+    def _on_close(self):
+        # Досохраняем снимок, если последние правки ещё не попали в него
+        if self.snapshot_write_job is not None:
+            self.after_cancel(self.snapshot_write_job)
+        if self.background_executor is not None:
+            # Фоновая запись снимка могла ещё идти; иначе она бы затёрла более свежий снимок.
+            # Соединение фонового потока закрывается последней задачей в нём же
+            self.background_executor.submit(close_connection)
+            self.background_executor.shutdown(wait=True)
+        try:
+            if get_change_counter() != self.snapshot_counter:
+                build_snapshot_from_database()
+        except Exception as e:
+            print(f"Could not write the library snapshot: {e}")
+        self.poster_loader.close()
+        self.destroy()
+
+    def _run_in_background(self, work, on_done):
+        # Один фоновый поток для запросов к БД; результат забирается в UI-потоке опросом через after()
+        if self.background_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background")
+        future = self.background_executor.submit(work)
+        self._poll_background(future, on_done)
+        return future
+
+    def _poll_background(self, future, on_done):
+        if future.done():
+            on_done(future)
+        else:
+            self.after(BACKGROUND_POLL_INTERVAL_MS, self._poll_background, future, on_done)
+
+    def _set_library(self, movies):
+        self.library_movies = movies
+        self.movie_summaries = {movie["id"]: movie for movie in self.library_movies}
         self.apply_filters()
+        if self.search_bits is not None:
+            self._start_search()  # в библиотеке могли появиться новые совпадения
 
-    def refresh_movie_list(self, tags_to_filter=None):
-        # Удаляем все виджеты кроме кнопки-переключателя и grid_container (если есть)
-        for widget in self.movie_list_frame.winfo_children():
-            if widget is not self.toggle_view_button and widget is not self.grid_container:
-                widget.destroy()
-        # Удаляем grid_container, если он был создан ранее
-        if self.grid_container is not None:
-            self.grid_container.destroy()
-            self.grid_container = None
-        movies = get_filtered_movies(tags_to_filter)
+    def show_movies(self, movies):
         if self.view_mode == "list":
-            for movie_id, title, folder_path in movies:
-                is_selected = (movie_id == self.current_selected_movie_id)
-                base_color = "#9C27B0" if is_selected else "transparent"
-                hover_color = ("#7B1FA2", "#9C27B0") if is_selected else ("#333333", "#555555")
-                movie_frame = ctk.CTkFrame(self.movie_list_frame, corner_radius=5, fg_color=base_color)
-                movie_frame.pack(pady=2, padx=5, fill="x")
-                movie_frame.bind("<Button-1>", lambda e, mid=movie_id: self.show_movie_details(mid))
-                movie_frame.bind("<Button-2>", lambda e, path=folder_path: self.open_folder_in_explorer(path))
-                title_var = ctk.StringVar(value=title)
-                title_entry = ctk.CTkEntry(movie_frame, textvariable=title_var, state="normal", border_width=0,
-                                           fg_color="transparent", font=ctk.CTkFont(size=14))
-                title_entry.pack(side="left", padx=10, pady=5, fill="x", expand=True)
-                title_entry.configure(state="readonly")  # Set to readonly after packing to allow selection
-                title_entry.bind("<Button-1>", lambda e, mid=movie_id: self.show_movie_details(mid))
-                title_entry.bind("<Button-2>", lambda e, path=folder_path: self.open_folder_in_explorer(path))
-                title_entry.bind("<Button-3>", lambda e, w=title_entry: self._handle_title_right_click(e, w))
-                self.bind_all_children(title_entry, "<Control-c>", lambda e, w=title_entry: self._copy_to_clipboard(w))
-                def on_enter(event, w=movie_frame, sel=is_selected, hc=hover_color, mid=movie_id, te=title_entry):
-                    # Don't change the background color on hover
-                    # Only show preview
-                    if self.preview_after_id:
-                        self.after_cancel(self.preview_after_id)
-                    self.preview_after_id = self.after(200, lambda: self.show_preview(mid, te))
-
-                def on_leave(event, w=movie_frame, sel=is_selected, bc=base_color):
-                    # Check if this is the currently selected movie
-                    is_current = False
-                    if self.current_selected_movie_id is not None:
-                        for child in w.winfo_children():
-                            if isinstance(child, ctk.CTkEntry):
-                                movie_title = child.get()
-                                details = get_movie_details(self.current_selected_movie_id)
-                                if details and details["title"] == movie_title:
-                                    is_current = True
-                    
-                    if is_current:
-                        w.configure(fg_color="#9C27B0")
-                    else:
-                        w.configure(fg_color="transparent")
-                        
-                    if self.preview_after_id:
-                        self.after_cancel(self.preview_after_id)
-                        self.preview_after_id = None
-                    self.hide_preview()
-                movie_frame.bind("<Enter>", on_enter)
-                movie_frame.bind("<Leave>", on_leave)
-                title_entry.bind("<Enter>", on_enter)
-                title_entry.bind("<Leave>", on_leave)
+            self.movie_grid_view.grid_remove()
+            self.movie_list_view.grid(row=1, column=0, columnspan=4, padx=5, pady=(0, 5), sticky="nsew")
+            self.movie_list_view.set_items(movies, keep_offset=True)
         else:  # grid view
-            self.grid_container = ctk.CTkFrame(self.movie_list_frame)
-            self.grid_container.pack(fill="both", expand=True)
-            columns = 4
-            thumb_size = (100, 150)
-            row = 0
-            col = 0
-            for movie_id, title, folder_path in movies:
-                is_selected = (movie_id == self.current_selected_movie_id)
-                base_color = "#9C27B0" if is_selected else "#222222"
-                hover_color = ("#7B1FA2", "#9C27B0") if is_selected else ("#333333", "#555555")
-                grid_frame = ctk.CTkFrame(self.grid_container, corner_radius=8, fg_color=base_color, width=120, height=210)
-                grid_frame.grid(row=row, column=col, padx=10, pady=10, sticky="n")
-                grid_frame.grid_propagate(False)
-                details = get_movie_details(movie_id)
-                poster_path = details.get("poster_path") if details else None
-                if poster_path and os.path.exists(poster_path):
-                    try:
-                        pil_image = Image.open(poster_path)
-                        poster_image = ctk.CTkImage(pil_image, size=thumb_size)
-                        poster_label = ctk.CTkLabel(grid_frame, image=poster_image, text="")
-                        poster_label.pack(pady=(10, 5))
-                        poster_label._image = poster_image
-                    except Exception:
-                        poster_label = ctk.CTkLabel(grid_frame, text="No Poster")
-                        poster_label.pack(pady=(10, 5))
-                else:
-                    poster_label = ctk.CTkLabel(grid_frame, text="No Poster")
-                    poster_label.pack(pady=(10, 5))
-                title_var = ctk.StringVar(value=title)
-                title_entry = ctk.CTkEntry(grid_frame, textvariable=title_var, state="normal",
-                                           font=ctk.CTkFont(size=13, weight="bold"), border_width=0,
-                                           fg_color="transparent", justify="center")
-                title_entry.pack(pady=(0, 10), padx=5, fill="x")
-                title_entry.configure(state="readonly")  # Set to readonly after packing to allow selection
-                title_entry.bind("<Button-1>", lambda e, mid=movie_id: self.show_movie_details(mid))
-                title_entry.bind("<Button-2>", lambda e, path=folder_path: self.open_folder_in_explorer(path))
-                
-                # Bind events to poster_label
-                poster_label.bind("<Button-1>", lambda e, mid=movie_id: self.show_movie_details(mid))
-                poster_label.bind("<Button-2>", lambda e, path=folder_path: self.open_folder_in_explorer(path))
-                
-                # Bind events to title_entry
-                title_entry.bind("<Button-1>", lambda e, mid=movie_id: self.show_movie_details(mid))
-                title_entry.bind("<Button-2>", lambda e, path=folder_path: self.open_folder_in_explorer(path))
-                title_entry.bind("<Button-3>", lambda e, w=title_entry: self._handle_title_right_click(e, w))
-                self.bind_all_children(title_entry, "<Control-c>", lambda e, w=title_entry: self._copy_to_clipboard(w))
-                
-                # Hover effects
-                grid_frame.bind("<Enter>", lambda e, w=grid_frame, sel=is_selected, mid=movie_id: self._on_grid_enter_updated(w, sel, mid))
-                grid_frame.bind("<Leave>", lambda e, w=grid_frame, sel=is_selected: self._on_grid_leave_updated(w, sel))
-                poster_label.bind("<Enter>", lambda e, w=grid_frame, sel=is_selected, mid=movie_id: self._on_grid_enter_updated(w, sel, mid))
-                poster_label.bind("<Leave>", lambda e, w=grid_frame, sel=is_selected: self._on_grid_leave_updated(w, sel))
-                title_entry.bind("<Enter>", lambda e, w=grid_frame, sel=is_selected, mid=movie_id: self._on_grid_enter_updated(w, sel, mid))
-                title_entry.bind("<Leave>", lambda e, w=grid_frame, sel=is_selected: self._on_grid_leave_updated(w, sel))
-                
-                # Remove these duplicate bindings
-                # grid_frame.bind("<Button-1>", functools.partial(self._on_grid_click, movie_id))
-                # grid_frame.bind("<Button-2>", lambda e, path=folder_path: self.open_folder_in_explorer(path))
-                # poster_label.bind("<Button-1>", functools.partial(self._on_grid_click, movie_id))
-                col += 1
-                if col >= columns:
-                    col = 0
-                    row += 1
-
-    def _on_grid_enter_updated(self, grid_frame, is_selected, movie_id):
+            self.movie_list_view.grid_remove()
+            self.movie_grid_view.grid(row=1, column=0, columnspan=4, padx=5, pady=(0, 5), sticky="nsew")
+            self.movie_grid_view.set_items(movies, keep_offset=True)
+
+    def _create_list_row(self, parent):
+        row = ctk.CTkFrame(parent, corner_radius=5, fg_color="transparent", height=LIST_ROW_HEIGHT)
+        row.pack_propagate(False)
+        row.movie_id = None
+        row.folder_path = None
+        row.title_var = ctk.StringVar()
+        title_entry = ctk.CTkEntry(row, textvariable=row.title_var, state="normal", border_width=0,
+                                   fg_color="transparent", font=ctk.CTkFont(size=14))
+        title_entry.pack(side="left", padx=10, pady=5, fill="x", expand=True)
+        title_entry.configure(state="readonly")  # Set to readonly after packing to allow selection
+        row.title_entry = title_entry
+        # Обработчики читают movie_id/folder_path из строки, поэтому переживают перепривязку к другим данным
+        for widget in (row, title_entry):
+            widget.bind("<Button-1>", lambda e: self._on_title_click(e, row.movie_id))
+            widget.bind("<Button-2>", lambda e: self.open_folder_in_explorer(row.folder_path))
+            widget.bind("<Enter>", lambda e: self._on_list_row_enter(row))
+            widget.bind("<Leave>", lambda e: self._on_list_row_leave(row))
+        title_entry.bind("<Button-3>", lambda e: self._handle_title_right_click(e, title_entry))
+        self.bind_all_children(title_entry, "<Control-c>", lambda e: self._copy_to_clipboard(title_entry))
+        return row
+
+    def _bind_list_row(self, row, movie, index):
+        row.movie_id = movie["id"]
+        row.folder_path = movie["folder_path"]
+        row.title_var.set(movie["title"])
+        row.configure(fg_color="#9C27B0" if movie["id"] in self.selected_movie_ids else "transparent")
+
+    def _on_list_row_enter(self, row):
         # Don't change the background color on hover
         # Only show preview
+        self._schedule_preview(row, row.title_entry, self.movie_list_view)
+
+    def _on_list_row_leave(self, row):
+        row.configure(fg_color="#9C27B0" if row.movie_id in self.selected_movie_ids else "transparent")
         if self.preview_after_id:
             self.after_cancel(self.preview_after_id)
-        self.preview_after_id = self.after(200, lambda: self.show_preview(movie_id, grid_frame))
-
-    def _on_grid_leave_updated(self, grid_frame, is_selected):
-        # Re-check if this is the currently selected movie
-        is_current = False
-        if self.current_selected_movie_id is not None:
-            for child in grid_frame.winfo_children():
-                if isinstance(child, ctk.CTkEntry):
-                    movie_title = child.get()
-                    details = get_movie_details(self.current_selected_movie_id)
-                    if details and details["title"] == movie_title:
-                        is_current = True
-        
-        if is_current:
-            grid_frame.configure(fg_color="#9C27B0")
+            self.preview_after_id = None
+        self.hide_preview()
+
+    def _create_grid_tile(self, parent):
+        tile = ctk.CTkFrame(parent, corner_radius=8, fg_color="#222222", width=GRID_TILE_SIZE[0],
+                            height=GRID_TILE_SIZE[1])
+        tile.pack_propagate(False)
+        tile.movie_id = None
+        tile.folder_path = None
+        tile.poster_path = None
+        tile.loaded_poster_path = None  # постер, который сейчас реально показан в плитке
+        tile.poster_request = None  # (запрос, колбэк) ещё не пришедшего постера
+        tile.poster_label = ctk.CTkLabel(tile, text="No Poster", width=THUMBNAIL_SIZES["grid"][0],
+                                         height=THUMBNAIL_SIZES["grid"][1])
+        tile.poster_label.pack(pady=(10, 5))
+        tile.title_var = ctk.StringVar()
+        title_entry = ctk.CTkEntry(tile, textvariable=tile.title_var, state="normal",
+                                   font=ctk.CTkFont(size=13, weight="bold"), border_width=0,
+                                   fg_color="transparent", justify="center")
+        title_entry.pack(pady=(0, 10), padx=5, fill="x")
+        title_entry.configure(state="readonly")  # Set to readonly after packing to allow selection
+        for widget in (tile, tile.poster_label, title_entry):
+            widget.bind("<Enter>", lambda e: self._on_grid_tile_enter(tile))
+            widget.bind("<Leave>", lambda e: self._on_grid_tile_leave(tile))
+        for widget in (tile.poster_label, title_entry):
+            widget.bind("<Button-1>", lambda e: self._on_title_click(e, tile.movie_id))
+            widget.bind("<Button-2>", lambda e: self.open_folder_in_explorer(tile.folder_path))
+        title_entry.bind("<Button-3>", lambda e: self._handle_title_right_click(e, title_entry))
+        self.bind_all_children(title_entry, "<Control-c>", lambda e: self._copy_to_clipboard(title_entry))
+        return tile
+
+    def _bind_grid_tile(self, tile, movie, index):
+        tile.movie_id = movie["id"]
+        tile.folder_path = movie["folder_path"]
+        tile.poster_path = movie["poster_path"]
+        tile.title_var.set(movie["title"])
+        tile.configure(fg_color="#9C27B0" if movie["id"] in self.selected_movie_ids else "#222222")
+        if tile.poster_request is not None and tile.poster_request[0].key[0] != tile.poster_path:
+            # Плитку переиспользовали до того, как пришёл её прежний постер
+            self.poster_loader.cancel(*tile.poster_request)
+            tile.poster_request = None
+        if not tile.poster_path:
+            tile.poster_label.configure(image=None, text="No Poster")
+            tile.loaded_poster_path = None
+            return
+        if tile.loaded_poster_path == tile.poster_path:
+            return
+        if tile.poster_request is None:
+            tile.poster_label.configure(image=None, text="")
+            tile.loaded_poster_path = None
+        first, last = self.movie_grid_view.visible_range()
+        self._request_grid_poster(tile, PRIORITY_VISIBLE if first <= index < last else PRIORITY_PREFETCH)
+
+    def _request_grid_poster(self, tile, priority):
+        if tile.poster_request is not None:
+            request, callback = tile.poster_request
+            if request.state == "queued":
+                # Уже в очереди, например как плитка из запаса за краем экрана; повторный запрос поднимает приоритет
+                self.poster_loader.request(tile.poster_path, "grid", callback, priority)
+                return
+            if request.state == "running":
+                return
+        callback = functools.partial(self._on_grid_poster_loaded, tile, tile.poster_path)
+        tile.poster_request = self.request_poster(tile.poster_path, "grid", callback, priority)
+
+    def _on_grid_layout(self):
+        # После прокрутки плитки из запаса оказываются на экране, а bind_row для них не вызывается
+        view = self.movie_grid_view
+        first, last = view.visible_range()
+        for tile, index in view.row_indices.items():
+            if first <= index < last and tile.poster_path and tile.loaded_poster_path != tile.poster_path:
+                self._request_grid_poster(tile, PRIORITY_VISIBLE)
+
+    def _on_grid_poster_loaded(self, tile, poster_path, poster_image):
+        if tile.poster_path != poster_path:
+            return
+        request = tile.poster_request
+        tile.poster_request = None
+        if request is not None and request[0].state == "dropped":
+            # Вытеснен из переполненной очереди: видимая плитка просит снова, остальные - когда станут видны
+            first, last = self.movie_grid_view.visible_range()
+            if first <= self.movie_grid_view.row_indices.get(tile, -1) < last:
+                self._request_grid_poster(tile, PRIORITY_VISIBLE)
+            return
+        if poster_image is None:
+            tile.poster_label.configure(image=None, text="No Poster")
         else:
-            grid_frame.configure(fg_color="#222222")
-            
+            tile.poster_label.configure(image=poster_image, text="")
+            tile.poster_label._image = poster_image
+        tile.loaded_poster_path = poster_path
+
+    def request_poster(self, poster_path, variant, callback, priority):
+        # Повторные показы берут уже декодированную картинку из poster_cache сразу, без очереди;
+        # возвращает (запрос, колбэк) для poster_loader.cancel или None, если колбэк уже вызван
+        poster_image = poster_cache.get((poster_path, THUMBNAIL_SIZES[variant]))
+        if poster_image is not None:
+            callback(poster_image)
+            return None
+        request = self.poster_loader.request(poster_path, variant, callback, priority)
+        return None if request.state == "done" else (request, callback)
+
+    def _finish_poster(self, key, pil_image):
+        # UI-поток: CTkImage создаётся здесь, а не в рабочем потоке
+        poster_path, variant = key
+        size = THUMBNAIL_SIZES[variant]
+        poster_image, nbytes = make_poster_image(pil_image, size)
+        poster_cache.put((poster_path, size), poster_image, nbytes)
+        return poster_image
+
+    def _on_grid_tile_enter(self, tile):
+        # Don't change the background color on hover
+        # Only show preview
+        self._schedule_preview(tile, tile, self.movie_grid_view)
+
+    def _schedule_preview(self, row, anchor_widget, view):
+        if self.preview_after_id:
+            self.after_cancel(self.preview_after_id)
+        movie_id = row.movie_id
+        self.preview_after_id = self.after(PREVIEW_DELAY_MS, lambda: self.show_preview(movie_id, anchor_widget))
+        # Постеры наведённого тайтла и соседей на экране начинают грузиться уже во время задержки
+        self._prefetch_previews(row, view)
+
+    def _prefetch_previews(self, row, view):
+        index = view.row_indices.get(row)
+        if index is None:
+            return
+        first, last = view.visible_range()
+        distance = view.columns() + 1  # в сетке - плитки слева, справа, сверху и снизу
+        indices = [index]
+        for step in range(1, distance + 1):
+            indices += [i for i in (index - step, index + step) if first <= i < last]
+        wanted = [view.items[i]["poster_path"] for i in indices if view.items[i]["poster_path"]]
+        # Указатель ушёл дальше: ещё не начатые загрузки больше не нужны
+        for poster_path in [path for path in self.preview_loads if path not in wanted]:
+            self.poster_loader.cancel(*self.preview_loads.pop(poster_path))
+        for poster_path in wanted:
+            self._request_preview_poster(poster_path, PRIORITY_PREVIEW if poster_path == wanted[0] else PRIORITY_PREFETCH)
+
+    def _request_preview_poster(self, poster_path, priority=PRIORITY_PREVIEW):
+        if poster_path in self.preview_loads:
+            request, callback = self.preview_loads[poster_path]
+            if request.state in ("queued", "running"):
+                # Уже ждёт как сосед; повторный запрос только поднимает приоритет
+                self.poster_loader.request(poster_path, "preview", callback, priority)
+                return
+            del self.preview_loads[poster_path]  # вытеснен из переполненной очереди
+        callback = functools.partial(self._on_preview_poster_loaded, poster_path)
+        request = self.request_poster(poster_path, "preview", callback, priority)
+        if request is not None:
+            self.preview_loads[poster_path] = request
+
+    def _on_preview_poster_loaded(self, poster_path, poster_image):
+        load = self.preview_loads.pop(poster_path, None)
+        movie = self.movie_summaries.get(self.preview_movie_id)
+        if movie is None or movie["poster_path"] != poster_path:
+            return
+        if load is not None and load[0].state == "dropped":
+            self._request_preview_poster(poster_path)  # вытеснен из очереди, пока ждал соседом
+            return
+        self._show_preview_poster(poster_image)
+
+    def _on_grid_tile_leave(self, tile):
+        tile.configure(fg_color="#9C27B0" if tile.movie_id in self.selected_movie_ids else "#222222")
         if self.preview_after_id:
             self.after_cancel(self.preview_after_id)
             self.preview_after_id = None
@@ -456,7 +1101,25 @@ class App(ctk.CTk):
         else:
             self.global_tag_manager_window.focus()
 
+    def _on_details_poster_loaded(self, movie_id, poster_image):
+        if movie_id != self.current_selected_movie_id:
+            return
+        self.details_poster_request = None
+        if poster_image is None:
+            self.details_poster_label.configure(image=self.placeholder_image, text="No Poster")
+            self.details_poster_label.image = self.placeholder_image
+        else:
+            self.details_poster_label.configure(image=poster_image, text="")
+            self.details_poster_label.image = poster_image
+
+    def _show_details_tags(self, tags):
+        if tags:
+            self.tags_label.configure(text=f"Tags: {', '.join(tags)}")
+        else:
+            self.tags_label.configure(text="Tags: None")
+
     def show_movie_details(self, movie_id):
+        previous_movie_id = self.current_selected_movie_id
         self.current_selected_movie_id = movie_id
         self.disable_details_buttons()
         self.set_poster_button.configure(state="normal")
@@ -468,82 +1131,181 @@ class App(ctk.CTk):
             self.current_folder_path = None
             return
         self.current_folder_path = details.get("folder_path")  # сохраняем путь
+        if movie_id in self.movie_summaries:
+            self.movie_summaries[movie_id].update(poster_path=details["poster_path"], tags=details["tags"],
+                                                  content_type=details["content_type"])
+        if self.details_poster_request is not None:
+            self.poster_loader.cancel(*self.details_poster_request)
+            self.details_poster_request = None
         poster_path = details.get("poster_path")
-        if poster_path and os.path.exists(poster_path):
-            try:
-                pil_image = Image.open(poster_path)
-                poster_image = ctk.CTkImage(pil_image, size=(250, 375))
-                self.details_poster_label.configure(image=poster_image, text="")
-                self.details_poster_label.image = poster_image
-            except Exception as e:
-                self.details_poster_label.configure(image=self.placeholder_image, text="Error")
-                self.details_poster_label.image = self.placeholder_image
+        if poster_path:
+            self.details_poster_label.configure(image=self.placeholder_image, text="Loading...")
+            self.details_poster_label.image = self.placeholder_image
+            callback = functools.partial(self._on_details_poster_loaded, movie_id)
+            self.details_poster_request = self.request_poster(poster_path, "details", callback, PRIORITY_DETAILS)
         else:
             self.details_poster_label.configure(image=self.placeholder_image, text="No Poster")
             self.details_poster_label.image = self.placeholder_image
         self.title_string_var.set(details["title"])
         self.details_type_label.configure(text=f"Type: {details['content_type']}")
-        if details["tags"]:
-            self.tags_label.configure(text=f"Tags: {', '.join(details['tags'])}")
+        self._show_details_tags(details["tags"])
+        self.details_files = []
+        self.details_files_movie_id = movie_id
+        self.details_files_load_pending = False
+        videos = get_movie_file_stats(movie_id).get(FILE_KIND_VIDEO)
+        if videos and details["content_type"] != 'gallery':
+            self.details_files_label.configure(text=f"Files: {videos['count']} videos, {format_size(videos['size'])}")
         else:
-            self.tags_label.configure(text="Tags: None")
-        for widget in self.details_files_scrollable_frame.winfo_children(): widget.destroy()
+            self.details_files_label.configure(text="Files")
         if details["content_type"] == 'gallery':
-            info_label = ctk.CTkLabel(self.details_files_scrollable_frame,
-                                      text="Image gallery mode.\nFile list is hidden for performance.",
-                                      text_color="gray")
-            info_label.pack(pady=20)
+            self.details_files_exhausted = True
+            self._show_files_message("Image gallery mode.\nFile list is hidden for performance.")
         else:
-            video_files = [f for f in details["files"] if os.path.splitext(f)[1].lower() in VIDEO_EXTENSIONS]
-            if not video_files:
-                info_label = ctk.CTkLabel(self.details_files_scrollable_frame, text="No video files found.",
-                                          text_color="gray")
-                info_label.pack(pady=20)
-            else:
-                for file_path in video_files:
-                    file_name = os.path.basename(file_path)
-                    file_label = ctk.CTkLabel(self.details_files_scrollable_frame, text=file_name, anchor="w",
-                                              cursor="hand2")
-                    file_label.pack(anchor="w", padx=10, pady=2)
-                    file_label.bind("<Button-1>", lambda e, path=file_path: self.play_file(path))
-        self.update_selection_highlight()
-
-    def update_selection_highlight(self):
-        # Обновляет выделение выбранного элемента без пересоздания всего списка/сетки
+            self.details_files_exhausted = False
+            self._load_next_files_page(movie_id)
+        self.update_selection_highlight({previous_movie_id, movie_id})
+
+    def clear_movie_details(self):
+        self.current_selected_movie_id = None
+        self.current_folder_path = None
+        self.disable_details_buttons()
+        if self.details_poster_request is not None:
+            self.poster_loader.cancel(*self.details_poster_request)
+            self.details_poster_request = None
+        self.details_poster_label.configure(image=self.placeholder_image, text="No Poster")
+        self.details_poster_label.image = self.placeholder_image
+        self.title_string_var.set("")
+        self.details_type_label.configure(text="Type: -")
+        self.tags_label.configure(text="Tags: -")
+        self.details_files = []
+        self.details_files_movie_id = None
+        self.details_files_exhausted = True
+        self.details_files_load_pending = False
+        self.details_files_label.configure(text="Files")
+        self._show_files_message("")
+
+    def _show_files_message(self, text):
+        self.details_files_view.pack_forget()
+        self.details_files_view.set_items([])
+        self.details_files_info_label.configure(text=text)
+        self.details_files_info_label.pack(pady=20)
+
+    def _on_files_list_end(self):
+        # Вызывается из layout(), поэтому следующая страница грузится уже после перерисовки
+        if self.details_files_exhausted or self.details_files_load_pending:
+            return
+        self.details_files_load_pending = True
+        self.after_idle(self._load_next_files_page, self.details_files_movie_id)
+
+    def _load_next_files_page(self, movie_id):
+        if movie_id != self.details_files_movie_id:
+            return  # пока страница ждала очереди, выбрали другой тайтл
+        self.details_files_load_pending = False
+        after_path = self.details_files[-1] if self.details_files else ""
+        page = get_movie_files_page(movie_id, after_path, kind=FILE_KIND_VIDEO)
+        self.details_files_exhausted = len(page) < FILES_PAGE_SIZE
+        self.details_files.extend(page)
+        if not self.details_files:
+            self._show_files_message("No video files found.")
+            return
+        if not after_path:
+            self.details_files_info_label.pack_forget()
+            self.details_files_view.pack(padx=5, pady=(0, 5), fill="both", expand=True)
+        self.details_files_view.set_items(self.details_files, keep_offset=bool(after_path))
+
+    def _create_file_row(self, parent):
+        row = ctk.CTkLabel(parent, text="", anchor="w", cursor="hand2", height=FILE_ROW_HEIGHT)
+        row.file_path = None
+        row.bind("<Button-1>", lambda e: self.play_file(row.file_path))
+        return row
+
+    def _bind_file_row(self, row, file_path, index):
+        row.file_path = file_path
+        row.configure(text=os.path.basename(file_path))
+
+    def update_selection_highlight(self, changed_ids):
+        # Перекрашиваем только строки/плитки, у которых поменялось выделение, без запросов к БД
         if self.view_mode == "list":
-            for widget in self.movie_list_frame.winfo_children():
-                if widget is self.toggle_view_button or widget is self.grid_container:
-                    continue
-                if isinstance(widget, ctk.CTkFrame):
-                    is_selected = False
-                    for child in widget.winfo_children():
-                        if isinstance(child, ctk.CTkEntry):
-                            movie_title = child.get()
-                            if self.current_selected_movie_id is not None:
-                                details = get_movie_details(self.current_selected_movie_id)
-                                if details and details["title"] == movie_title:
-                                    is_selected = True
-                    widget.configure(fg_color="#9C27B0" if is_selected else "transparent")
+            view, base_color = self.movie_list_view, "transparent"
+        else:
+            view, base_color = self.movie_grid_view, "#222222"
+        if len(changed_ids) > len(view.rows_by_key):
+            rows = list(view.rows_by_key.items())  # например, «выделить всё»: на экране строк меньше
+        else:
+            rows = [(movie_id, view.row_for_key(movie_id)) for movie_id in changed_ids]
+        for movie_id, row in rows:
+            if row is not None:
+                row.configure(fg_color="#9C27B0" if movie_id in self.selected_movie_ids else base_color)
+
+    def _on_title_click(self, event, movie_id):
+        # Клик - один тайтл; Ctrl-клик добавляет или убирает тайтл; Shift-клик - диапазон от предыдущего клика
+        if movie_id is None:
+            return
+        previous = self.selected_movie_ids
+        if event.state & SHIFT_MASK and self.selection_anchor_id is not None:
+            self._set_selection(self._shown_range(self.selection_anchor_id, movie_id) | {movie_id})
+        elif event.state & CONTROL_MASK:
+            self.selection_anchor_id = movie_id
+            self._set_selection(previous ^ {movie_id})
+            if movie_id not in self.selected_movie_ids:
+                # Сняли выделение с тайтла из карточки - карточка переходит на другой выделенный или очищается
+                if movie_id == self.current_selected_movie_id:
+                    self._show_other_selected()
+                return
+        else:
+            self.selection_anchor_id = movie_id
+            self._set_selection({movie_id})
+        self.show_movie_details(movie_id)
+
+    def _show_other_selected(self):
+        if not self.selected_movie_ids:
+            self.clear_movie_details()
+            return
+        items = self.movie_grid_view.items if self.view_mode == "grid" else self.movie_list_view.items
+        shown = [movie["id"] for movie in items if movie["id"] in self.selected_movie_ids]
+        self.show_movie_details(shown[0] if shown else min(self.selected_movie_ids))
+
+    def _shown_range(self, first_id, last_id):
+        items = self.movie_grid_view.items if self.view_mode == "grid" else self.movie_list_view.items
+        indices = [index for index, movie in enumerate(items) if movie["id"] in (first_id, last_id)]
+        if not indices:
+            return set()
+        return {movie["id"] for movie in items[indices[0]:indices[-1] + 1]}
+
+    def _set_selection(self, movie_ids):
+        changed = self.selected_movie_ids ^ movie_ids
+        self.selected_movie_ids = movie_ids
+        self.update_selection_highlight(changed)
+        self._update_selection_label()
+
+    def _update_selection_label(self):
+        count = len(self.selected_movie_ids)
+        self.movie_list_label.configure(text=f"Titles ({count} selected)" if count > 1 else "Titles")
+        self.tag_selected_button.configure(state="normal" if count else "disabled")
+
+    def select_all_shown(self):
+        items = self.movie_grid_view.items if self.view_mode == "grid" else self.movie_list_view.items
+        self._set_selection({movie["id"] for movie in items})
+
+    def clear_selection(self, event=None):
+        # Esc: остаётся только тайтл, открытый в карточке
+        current = self.current_selected_movie_id
+        self._set_selection({current} if current is not None else set())
+
+    def open_bulk_tag_editor(self):
+        if not self.selected_movie_ids:
+            return
+        if self.bulk_tag_window is None or not self.bulk_tag_window.winfo_exists():
+            self.bulk_tag_window = BulkTagWindow(self, sorted(self.selected_movie_ids))
         else:
-            if self.grid_container is not None:
-                for grid_frame in self.grid_container.winfo_children():
-                    if not isinstance(grid_frame, ctk.CTkFrame):
-                        continue
-                    is_selected = False
-                    for child in grid_frame.winfo_children():
-                        if isinstance(child, ctk.CTkEntry):
-                            movie_title = child.get()
-                            if self.current_selected_movie_id is not None:
-                                details = get_movie_details(self.current_selected_movie_id)
-                                if details and details["title"] == movie_title:
-                                    is_selected = True
-                    grid_frame.configure(fg_color="#9C27B0" if is_selected else "#222222")
+            self.bulk_tag_window.focus()
 
     def bind_all_children(self, widget, sequence, func):
         widget.bind(sequence, func)
         for child in widget.winfo_children(): child.bind(sequence, func)
 
     def play_file(self, file_path):
+        import subprocess
         if sys.platform == "win32":
             os.startfile(file_path)
         elif sys.platform == "darwin":
@@ -552,6 +1314,7 @@ class App(ctk.CTk):
             subprocess.run(["xdg-open", file_path])
 
     def open_folder_in_explorer(self, path):
+        import subprocess
         if sys.platform == "win32":
             os.startfile(path)
         elif sys.platform == "darwin":
@@ -560,27 +1323,111 @@ class App(ctk.CTk):
             subprocess.run(["xdg-open", path])
 
     def add_folder_dialog(self):
+        if self.scanner is not None and self.scanner.is_running(): return
+        from tkinter import filedialog
         path = filedialog.askdirectory(title="Select a folder with movies")
         if path:
-            for item in os.listdir(path):
-                full_path = os.path.join(path, item)
-                if os.path.isdir(full_path): self.add_movie_to_db(item, full_path)
-            print("Scanning complete!")
-            self.refresh_movie_list()
-            self.populate_sidebar_tags()
+            self._start_scan(lambda scanner: scanner.start(path))
+
+    def rescan_library(self):
+        if self.scanner is not None and self.scanner.is_running(): return
+        self._start_scan(lambda scanner: scanner.start_rescan())
+
+    def _start_scan(self, start):
+        from scanner import LibraryScanner
+        self.scan_errors = []
+        self.scanner = LibraryScanner()
+        start(self.scanner)
+        self.add_folder_button.configure(state="disabled")
+        self.rescan_button.configure(state="disabled")
+        self.scan_progress_bar.set(0)
+        self.scan_status_label.configure(text="Scanning...")
+        self.cancel_scan_button.configure(state="normal")
+        self.show_scan_errors_button.pack_forget()
+        self.scan_status_frame.pack(after=self.rescan_button, fill="x")
+        self.after(SCAN_POLL_INTERVAL_MS, self._poll_scanner)
+
+    def cancel_scan(self):
+        if self.scanner is not None:
+            self.scanner.cancel()
+            self.cancel_scan_button.configure(state="disabled")
+            self.scan_status_label.configure(text="Cancelling...")
+
+    def _poll_scanner(self):
+        finished_stats = None
+        for event in self.scanner.drain_events():
+            kind = event[0]
+            if kind == "progress":
+                done, total = event[1], event[2]
+                self.scan_progress_bar.set(done / total if total else 1)
+                self.scan_status_label.configure(text=f"Scanned {done} of {total} folders")
+            elif kind == "added":
+                # Rescans only change files, which the list does not show, so "updated" needs no refresh
+                movie_id, result = event[1], event[2]
+                self.scan_added_movies.append({"id": movie_id, "title": result.title,
+                                               "folder_path": result.folder_path, "poster_path": None,
+                                               "content_type": result.content_type, "tags": []})
+            elif kind == "error":
+                self.scan_errors.append((event[1], event[2]))
+            elif kind == "finished":
+                finished_stats = event[1]
+        if self.scan_added_movies and self.scan_list_refresh_after_id is None:
+            # Новые тайтлы подтягиваются в список не чаще раза в секунду
+            self.scan_list_refresh_after_id = self.after(SCAN_LIST_REFRESH_INTERVAL_MS, self._refresh_list_after_scan)
+        if finished_stats is None:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_scanner)
+            return
+        self._finish_scan(finished_stats)
+
+    def _refresh_list_after_scan(self):
+        self.scan_list_refresh_after_id = None
+        self._add_scanned_movies()
+
+    def _add_scanned_movies(self):
+        # Новые тайтлы вливаются в уже отсортированный список, без повторного запроса всей библиотеки
+        added, self.scan_added_movies = self.scan_added_movies, []
+        if not added:
+            return
+        added.sort(key=lambda movie: movie["title"])
+        self._set_library(list(heapq.merge(self.library_movies, added, key=lambda movie: movie["title"])))
+
+    def _finish_scan(self, stats):
+        summary = f"{'Cancelled' if stats['cancelled'] else 'Done'}: {stats['added']} added"
+        if stats["updated"] or stats["unchanged"]:
+            summary += f", {stats['updated']} updated, {stats['unchanged']} unchanged"
+        summary += f", {stats['skipped']} skipped"
+        if stats["errors"]:
+            summary += f", {stats['errors']} errors"
+            self.show_scan_errors_button.pack(padx=15, pady=(0, 5), fill="x")
+        summary += f"\n{stats['rows']} rows in {stats['seconds']:.1f}s ({stats['rows_per_sec']:.0f} rows/s)"
+        self.scan_status_label.configure(text=summary)
+        self.cancel_scan_button.configure(state="disabled")
+        self.add_folder_button.configure(state="normal")
+        self.rescan_button.configure(state="normal")
+        if self.scan_list_refresh_after_id is not None:
+            self.after_cancel(self.scan_list_refresh_after_id)
+            self.scan_list_refresh_after_id = None
+        self._add_scanned_movies()
+        self._write_snapshot_in_background()
+        if self.current_selected_movie_id:
+            self.show_movie_details(self.current_selected_movie_id)
 
     def set_current_movie_as_video(self):
         if self.current_selected_movie_id:
             update_movie_content_type(self.current_selected_movie_id, 'video')
             self.show_movie_details(self.current_selected_movie_id)
+            self.schedule_snapshot_write()
 
     def set_current_movie_as_gallery(self):
         if self.current_selected_movie_id:
             update_movie_content_type(self.current_selected_movie_id, 'gallery')
             self.show_movie_details(self.current_selected_movie_id)
+            self.schedule_snapshot_write()
 
     def set_poster_for_current_movie(self):
         if self.current_selected_movie_id is None: return
+        import shutil
+        from tkinter import filedialog
         source_poster_path = filedialog.askopenfilename(title="Select a poster image",
                                                         filetypes=[("Image Files", "*.jpg *.jpeg *.png *.webp"),
                                                                    ("All files", "*.*")])
@@ -590,40 +1437,18 @@ class App(ctk.CTk):
         try:
             shutil.copy2(source_poster_path, destination_poster_path)
             update_movie_poster(self.current_selected_movie_id, destination_poster_path)
+            generate_thumbnails(destination_poster_path)
+            tile = self.movie_grid_view.row_for_key(self.current_selected_movie_id)
+            if tile is not None:
+                tile.loaded_poster_path = None  # путь тот же, но файл новый
             self.show_movie_details(self.current_selected_movie_id)
+            self.schedule_snapshot_write()
         except Exception as e:
             print(f"Error copying poster file: {e}")
 
-    def add_movie_to_db(self, title, folder_path):
-        conn = sqlite3.connect('data/library.db')
-        cursor = conn.cursor()
-        content_type = 'video'
-        try:
-            items = os.listdir(folder_path)
-            files_only = [f for f in items if os.path.isfile(os.path.join(folder_path, f))]
-            if len(files_only) > 0 and len(files_only) > IMAGE_FILE_COUNT_THRESHOLD:
-                image_count = sum(1 for f in files_only if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
-                if (image_count / len(files_only)) > IMAGE_PERCENTAGE_THRESHOLD: content_type = 'gallery'
-        except Exception as e:
-            print(f"Could not analyze folder contents for content type: {e}")
-        try:
-            cursor.execute("INSERT INTO movies (title, folder_path, content_type) VALUES (?, ?, ?)",
-                           (title, folder_path, content_type))
-            movie_id = cursor.lastrowid
-            if content_type == 'video':
-                for root, _, files in os.walk(folder_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        cursor.execute("INSERT INTO files (movie_id, file_path) VALUES (?, ?)", (movie_id, file_path))
-            conn.commit()
-            print(f"Added title: {title} (Type: {content_type})")
-        except sqlite3.IntegrityError:
-            print(f"Title from folder {folder_path} already exists in the database.")
-        finally:
-            conn.close()
-
     def show_preview(self, movie_id, widget):
-        details = get_movie_details(movie_id)
+        # Всё, кроме постера, берётся из памяти; постер показывается из кэша или догружается в фоне
+        details = self.movie_summaries.get(movie_id)
         if not details:
             return
         if not widget.winfo_exists():
@@ -639,15 +1464,15 @@ class App(ctk.CTk):
             self.preview_title_label.pack(padx=10, pady=(0, 5))
             self.preview_tags_label = ctk.CTkLabel(self.preview_window, text="", font=ctk.CTkFont(size=12))
             self.preview_tags_label.pack(padx=10, pady=(0, 10))
+        self.preview_movie_id = movie_id
         poster_path = details.get("poster_path")
-        if poster_path and os.path.exists(poster_path):
-            try:
-                pil_image = Image.open(poster_path)
-                poster_image = ctk.CTkImage(pil_image, size=(120, 180))
-                self.preview_poster_label.configure(image=poster_image, text="")
-                self.preview_poster_label.image = poster_image
-            except Exception:
-                self.preview_poster_label.configure(image=None, text="No Poster")
+        if poster_path:
+            poster_image = poster_cache.get((poster_path, THUMBNAIL_SIZES["preview"]))
+            if poster_image is not None:
+                self._show_preview_poster(poster_image)
+            else:
+                self.preview_poster_label.configure(image=None, text="Loading...")
+                self._request_preview_poster(poster_path)
         else:
             self.preview_poster_label.configure(image=None, text="No Poster")
         self.preview_title_label.configure(text=details["title"])
@@ -659,7 +1484,15 @@ class App(ctk.CTk):
         self.preview_window.deiconify()
         self.preview_window.lift()
 
+    def _show_preview_poster(self, poster_image):
+        if poster_image is None:
+            self.preview_poster_label.configure(image=None, text="No Poster")
+        else:
+            self.preview_poster_label.configure(image=poster_image, text="")
+            self.preview_poster_label.image = poster_image
+
     def hide_preview(self):
+        self.preview_movie_id = None
         if self.preview_window and self.preview_window.winfo_exists():
             self.preview_window.withdraw()
 
@@ -670,7 +1503,7 @@ class App(ctk.CTk):
         else:
             self.view_mode = "list"
             self.toggle_view_button.configure(text="Grid View")
-        self.refresh_movie_list()
+        self.apply_filters()
 
     def open_current_movie_folder(self, event):
         if self.current_folder_path and os.path.exists(self.current_folder_path):
@@ -712,10 +1545,11 @@ class App(ctk.CTk):
 
 
 if __name__ == "__main__":
+    startup_profile = StartupProfile("--profile-startup" in sys.argv)
+    startup_profile.mark("imports")
+    snapshot = load_snapshot()
+    startup_profile.mark("snapshot read" if snapshot is not None else "no usable snapshot")
     ctk.set_appearance_mode("dark")
     ctk.set_default_color_theme("blue")
-    import database
-
-    database.init_db()
-    app = App()
+    app = App(startup_profile, snapshot)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,195 @@
+# poster_loader.py
+# Decodes posters on worker threads and hands the results back to the UI thread. No GUI imports:
+# the caller passes decode() for the workers, finish() for the UI thread and Tk's after() as schedule().
+import heapq
+import itertools
+import threading
+
+PRIORITY_DETAILS = 0  # the poster in the details panel
+PRIORITY_PREVIEW = 1  # the hover preview that is about to open
+PRIORITY_VISIBLE = 2  # grid tiles on screen
+PRIORITY_PREFETCH = 3  # overscan tiles and neighbours of the hovered title
+DEFAULT_WORKERS = 3
+DEFAULT_MAX_QUEUED = 256
+POLL_INTERVAL_MS = 15
+
+
+class PosterRequest:
+    def __init__(self, key, priority):
+        self.key = key  # (poster_path, variant)
+        self.priority = priority
+        self.callbacks = []
+        self.state = "queued"  # queued -> running -> done; or cancelled / dropped while still queued
+
+
+class PosterLoader:
+    """Priority queue of poster decodes served by a small thread pool.
+
+    decode(poster_path, variant) runs on a worker and returns a PIL image; finish(key, pil_image) runs on the
+    UI thread and returns the value passed to the callbacks (None if anything failed). Requests for the same
+    poster and variant share one decode. Every callback is called exactly once unless it is cancelled; a request
+    dropped from a full queue calls its callbacks with None and keeps the state "dropped", so the caller can
+    ask again later. With workers=0 no threads are started: queued requests are decoded in priority order on
+    the thread that delivers, from schedule() or run_pending(), which is what checks and headless tools want.
+    """
+
+    def __init__(self, decode, finish, schedule=None, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED):
+        self.decode = decode
+        self.finish = finish
+        self.schedule = schedule
+        self.workers = workers
+        self.max_queued = max_queued
+        self._requests = {}  # key -> queued or running request
+        self._heap = []  # (priority, sequence, request); stale entries are skipped when popped
+        self._sequence = itertools.count()
+        self._queued = 0
+        self._finished = []  # (request, pil_image, error) waiting for the UI thread
+        self._dropped = []  # requests dropped from a full queue whose callbacks still have to be called
+        self._cond = threading.Condition()
+        self._poll_scheduled = False
+        self._closed = False
+        self._threads = []
+
+    def request(self, poster_path, variant, callback, priority=PRIORITY_VISIBLE):
+        """Decode a poster and call callback(value) on the UI thread; returns the request for cancel()."""
+        key = (poster_path, variant)
+        with self._cond:
+            request = self._requests.get(key)
+            if request is None:
+                request = self._requests[key] = PosterRequest(key, priority)
+                self._push(request)
+                self._queued += 1
+                self._drop_over_limit()
+            elif request.state == "queued" and priority < request.priority:
+                # Already waiting with a lower priority, e.g. a prefetched tile that scrolled into view
+                request.priority = priority
+                self._push(request)
+            if callback not in request.callbacks:
+                request.callbacks.append(callback)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"poster-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        self._schedule_poll()
+        return request
+
+    def cancel(self, request, callback):
+        # The callback is not called; a queued decode nobody waits for any more is skipped
+        with self._cond:
+            if callback in request.callbacks:
+                request.callbacks.remove(callback)
+            if not request.callbacks and request.state == "queued":
+                request.state = "cancelled"
+                self._queued -= 1
+                self._requests.pop(request.key, None)
+
+    def run_pending(self):
+        # workers=0 without schedule(): decode everything queued and call the callbacks on this thread
+        self._deliver()
+
+    def pending(self):
+        with self._cond:
+            return self._queued
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._heap.clear()
+            self._cond.notify_all()
+
+    def _push(self, request):
+        heapq.heappush(self._heap, (request.priority, next(self._sequence), request))
+        if len(self._heap) > 4 * self.max_queued:
+            # Mostly cancelled or re-prioritised entries by now
+            self._heap = [entry for entry in self._heap if entry[2].state == "queued"]
+            heapq.heapify(self._heap)
+
+    def _drop_over_limit(self):
+        # The oldest request of the lowest priority goes first: it is the one most likely scrolled away
+        while self._queued > self.max_queued:
+            live = [(priority, -sequence, request) for priority, sequence, request in self._heap
+                    if request.state == "queued" and priority == request.priority]
+            _, _, request = max(live, key=lambda entry: entry[:2])
+            request.state = "dropped"
+            self._queued -= 1
+            self._requests.pop(request.key, None)
+            self._dropped.append(request)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                request = self._pop_queued()
+            if request is not None:
+                self._decode(request)
+
+    def _decode_queued(self):
+        # workers=0: the delivering thread does the workers' job first
+        while True:
+            with self._cond:
+                request = self._pop_queued()
+            if request is None:
+                return
+            self._decode(request)
+
+    def _pop_queued(self):
+        # Called with the lock held; cancelled, dropped and re-prioritised entries are skipped
+        while self._heap:
+            _, _, request = heapq.heappop(self._heap)
+            if request.state == "queued":
+                request.state = "running"
+                self._queued -= 1
+                return request
+        return None
+
+    def _decode(self, request):
+        try:
+            pil_image, error = self.decode(*request.key), None
+        except Exception as e:
+            pil_image, error = None, e
+        with self._cond:
+            self._finished.append((request, pil_image, error))
+
+    def _schedule_poll(self):
+        if not self._poll_scheduled and self.schedule is not None:
+            self._poll_scheduled = True
+            self.schedule(POLL_INTERVAL_MS, self._deliver)
+
+    def _deliver(self):
+        # UI thread: hand finished decodes to finish() and the callbacks, then keep polling while work is left
+        self._poll_scheduled = False
+        if self.workers == 0:
+            self._decode_queued()
+        with self._cond:
+            finished, self._finished = self._finished, []
+            dropped, self._dropped = self._dropped, []
+        for request in dropped:
+            with self._cond:
+                callbacks, request.callbacks = request.callbacks, []
+            for callback in callbacks:
+                callback(None)
+        for request, pil_image, error in finished:
+            self._complete(request, pil_image, error)
+        with self._cond:
+            busy = bool(self._requests) or bool(self._finished) or bool(self._dropped)
+        if busy and not self._closed:
+            self._schedule_poll()
+
+    def _complete(self, request, pil_image, error):
+        with self._cond:
+            if self._requests.get(request.key) is request:
+                del self._requests[request.key]
+            request.state = "done"
+            callbacks, request.callbacks = request.callbacks, []
+        value = None
+        if error is None:
+            try:
+                value = self.finish(request.key, pil_image)
+            except Exception:
+                value = None
+        for callback in callbacks:
+            callback(value)
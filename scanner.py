@@ -0,0 +1,458 @@
+# scanner.py
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from classifier import classify_folder, file_kind
+from database import get_connection, transaction, close_connection, tag_index, normalize_path
+
+DEFAULT_SCAN_WORKERS = 8
+# Folders on one disk or network mount scanned at the same time; more mostly adds seek/latency contention
+DEFAULT_SCAN_WORKERS_PER_DEVICE = 4
+IMPORT_BATCH_ROWS = 20000
+IMPORT_BATCH_SECONDS = 1.0
+
+
+class ScanResult:
+    def __init__(self, title, folder_path, content_type, files, dirs):
+        self.title = title
+        self.folder_path = folder_path
+        self.content_type = content_type
+        self.files = files  # (file_path, size, mtime_ns, extension, kind)
+        self.dirs = dirs  # (dir_path, mtime_ns)
+
+    @property
+    def row_count(self):
+        return 1 + len(self.files)
+
+
+class RescanDelta:
+    def __init__(self, movie_id, folder_path):
+        self.movie_id = movie_id
+        self.folder_path = folder_path
+        self.added_files = []  # (file_path, size, mtime_ns, extension, kind)
+        self.updated_files = []  # (size, mtime_ns, file_id)
+        self.removed_file_ids = []
+        self.dir_states = []  # (movie_id, dir_path, mtime_ns) for directories that were re-listed
+        self.removed_dirs = []
+        self.dirs_skipped = 0
+
+    @property
+    def row_count(self):
+        return len(self.added_files) + len(self.updated_files) + len(self.removed_file_ids)
+
+
+def list_title_folders(root_path):
+    # Every direct subdirectory of the root is treated as one title
+    with os.scandir(root_path) as entries:
+        return sorted((entry.name, entry.path) for entry in entries if entry.is_dir())
+
+
+def _entry_stat(entry):
+    try:
+        st = entry.stat()
+    except OSError:  # broken symlink
+        st = entry.stat(follow_symlinks=False)
+    return st.st_size, st.st_mtime_ns
+
+
+def walk_title(folder_path):
+    """List every file below folder_path with its size and mtime, plus the mtime of every directory."""
+    files = []
+    dirs = []
+    stack = [folder_path]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            dirs.append((dir_path, os.stat(dir_path).st_mtime_ns))
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        files.append((entry.path, *_entry_stat(entry), *file_kind(entry.name)))
+        except OSError:
+            if dir_path == folder_path: raise
+            # Как и os.walk, молча пропускаем нечитаемые подпапки
+    return files, dirs
+
+
+def scan_title(title, folder_path):
+    # Filesystem-only part of an import, safe to run on any worker thread
+    content_type = classify_folder(folder_path)
+    if content_type == 'video':
+        files, dirs = walk_title(folder_path)
+    else:
+        files, dirs = [], []
+    return ScanResult(title, folder_path, content_type, files, dirs)
+
+
+def compute_rescan_delta(movie_id, folder_path):
+    """Compare a title folder with its stored file state.
+
+    Directories whose mtime is unchanged are not listed again: their own entries cannot have been added,
+    removed or renamed, so only their known subdirectories are visited. Size/mtime changes of existing
+    files are picked up only in directories that are re-listed.
+    """
+    conn = get_connection()
+    known_dirs = dict(conn.execute("SELECT dir_path, mtime_ns FROM folder_state WHERE movie_id = ?", (movie_id,)))
+    known_files = {}
+    for file_id, file_path, size, mtime_ns in conn.execute(
+            "SELECT id, file_path, size, mtime_ns FROM files WHERE movie_id = ?", (movie_id,)):
+        known_files.setdefault(os.path.dirname(file_path), {})[os.path.basename(file_path)] = (file_id, size, mtime_ns)
+    known_children = {}
+    for dir_path in known_dirs:
+        if dir_path != folder_path:
+            known_children.setdefault(os.path.dirname(dir_path), []).append(dir_path)
+
+    delta = RescanDelta(movie_id, folder_path)
+    seen_dirs = set()
+    stack = [folder_path]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            if dir_path == folder_path: raise
+            continue
+        seen_dirs.add(dir_path)
+        if known_dirs.get(dir_path) == mtime_ns:
+            delta.dirs_skipped += 1
+            stack.extend(known_children.get(dir_path, ()))
+            continue
+        existing = known_files.get(dir_path, {})
+        seen_names = set()
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    seen_names.add(entry.name)
+                    size, file_mtime_ns = _entry_stat(entry)
+                    known = existing.get(entry.name)
+                    if known is None:
+                        delta.added_files.append((entry.path, size, file_mtime_ns, *file_kind(entry.name)))
+                    elif (known[1], known[2]) != (size, file_mtime_ns):
+                        delta.updated_files.append((size, file_mtime_ns, known[0]))
+        except OSError:
+            if dir_path == folder_path: raise
+            continue  # keep what we knew about an unreadable subfolder
+        delta.dir_states.append((movie_id, dir_path, mtime_ns))
+        delta.removed_file_ids.extend(file_id for name, (file_id, _, _) in existing.items() if name not in seen_names)
+    # Files and state of directories that disappeared
+    for dir_path, entries in known_files.items():
+        if dir_path not in seen_dirs:
+            delta.removed_file_ids.extend(file_id for file_id, _, _ in entries.values())
+    delta.removed_dirs = [dir_path for dir_path in known_dirs if dir_path not in seen_dirs]
+    return delta
+
+
+def _insert_files(conn, rows):
+    # One statement for the whole batch: the full-text triggers on files make FTS5 flush its pending terms at
+    # every statement, so executemany would write one tiny index segment per file
+    conn.execute("""
+        INSERT INTO files (movie_id, file_path, size, mtime_ns, extension, kind)
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]'),
+               json_extract(value, '$[3]'), json_extract(value, '$[4]'), json_extract(value, '$[5]')
+        FROM json_each(?)""", (json.dumps(rows),))
+
+
+def _delete_files(conn, file_ids):
+    conn.execute("DELETE FROM files WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(file_ids),))
+
+
+def write_scan_batch(results):
+    """Insert many scanned titles and their files in one transaction.
+
+    Returns (movie_id, result) pairs in input order; movie_id is None for folders already in the library.
+    """
+    written = []
+    file_rows = []
+    dir_rows = []
+    with transaction() as conn:
+        for result in results:
+            try:
+                cursor = conn.execute("INSERT INTO movies (title, folder_path, content_type) VALUES (?, ?, ?)",
+                                      (result.title, result.folder_path, result.content_type))
+            except sqlite3.IntegrityError:
+                written.append((None, result))
+                continue
+            movie_id = cursor.lastrowid
+            file_rows.extend((movie_id, *row) for row in result.files)
+            dir_rows.extend((movie_id, dir_path, mtime_ns) for dir_path, mtime_ns in result.dirs)
+            written.append((movie_id, result))
+        _insert_files(conn, file_rows)
+        conn.executemany("INSERT OR REPLACE INTO folder_state (movie_id, dir_path, mtime_ns) VALUES (?, ?, ?)",
+                         dir_rows)
+    tag_index.add_movies(movie_id for movie_id, _ in written if movie_id is not None)
+    return written
+
+
+def apply_rescan_deltas(deltas):
+    """Apply file deltas computed by compute_rescan_delta in one transaction; returns (movie_id, delta) pairs."""
+    with transaction() as conn:
+        _insert_files(conn, [(delta.movie_id, *row) for delta in deltas for row in delta.added_files])
+        conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?",
+                         [row for delta in deltas for row in delta.updated_files])
+        _delete_files(conn, [file_id for delta in deltas for file_id in delta.removed_file_ids])
+        conn.executemany("INSERT OR REPLACE INTO folder_state (movie_id, dir_path, mtime_ns) VALUES (?, ?, ?)",
+                         [row for delta in deltas for row in delta.dir_states])
+        conn.executemany("DELETE FROM folder_state WHERE dir_path = ?",
+                         [(dir_path,) for delta in deltas for dir_path in delta.removed_dirs])
+    return [(delta.movie_id, delta) for delta in deltas]
+
+
+class ImportBatcher:
+    # Buffers scan results and rescan deltas and writes them once enough rows (or time) have piled up
+
+    def __init__(self, batch_rows=IMPORT_BATCH_ROWS, batch_seconds=IMPORT_BATCH_SECONDS):
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        self.pending = []
+        self.pending_rows = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.started_at = time.perf_counter()
+        self.last_flush_at = self.started_at
+
+    def add(self, item):
+        self.pending.append(item)
+        self.pending_rows += item.row_count
+        if (self.pending_rows >= self.batch_rows
+                or time.perf_counter() - self.last_flush_at >= self.batch_seconds):
+            return self.flush()
+        return []
+
+    def flush(self):
+        self.last_flush_at = time.perf_counter()
+        if not self.pending:
+            return []
+        batch, self.pending, self.pending_rows = self.pending, [], 0
+        with transaction():
+            written = write_scan_batch([item for item in batch if isinstance(item, ScanResult)])
+            written += apply_rescan_deltas([item for item in batch if isinstance(item, RescanDelta)])
+        self.rows_written += sum(item.row_count for movie_id, item in written if movie_id is not None)
+        self.batches_written += 1
+        return written
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started_at
+        return {"rows": self.rows_written, "batches": self.batches_written, "seconds": elapsed,
+                "rows_per_sec": self.rows_written / elapsed if elapsed > 0 else 0.0}
+
+
+_STOP_WRITER = object()
+
+
+class LibraryScanner:
+    # Scans folders on a worker pool and reports back through a queue that the UI polls with after().
+    # Jobs are grouped by device (disk or network mount) and at most workers_per_device of them run per device,
+    # so several devices are scanned side by side. A single writer thread owns all database writes.
+    # Events are tuples: ("started", total), ("added", movie_id, result), ("updated", movie_id, delta),
+    # ("skipped", folder_path), ("error", folder_path, message), ("progress", done, total)
+    # and finally ("finished", stats).
+
+    def __init__(self, max_workers=DEFAULT_SCAN_WORKERS, workers_per_device=DEFAULT_SCAN_WORKERS_PER_DEVICE):
+        self.max_workers = max_workers
+        self.workers_per_device = workers_per_device
+        self.events = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._write_queue = queue.Queue()
+        self._thread = None
+
+    def start(self, root_paths):
+        """Import every subfolder of one root folder (or of each folder in a list) not in the library yet."""
+        self._start([root_paths] if isinstance(root_paths, str) else list(root_paths), rescan=False)
+
+    def start_rescan(self, root_path=None):
+        """Refresh known titles from disk (all of them, or those under root_path) and import new subfolders."""
+        self._start([] if root_path is None else [root_path], rescan=True)
+
+    def _start(self, root_paths, rescan):
+        # Titles and files are stored under the normalized root, whatever form the caller passed in
+        root_paths = [normalize_path(root_path) for root_path in root_paths]
+        self._thread = threading.Thread(target=self._run, args=(root_paths, rescan), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def drain_events(self):
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _report_written(self, written, stats):
+        for movie_id, item in written:
+            if isinstance(item, RescanDelta):
+                stats["dirs_skipped"] += item.dirs_skipped
+                if item.row_count:
+                    stats["updated"] += 1
+                    self.events.put(("updated", movie_id, item))
+                else:
+                    stats["unchanged"] += 1
+            elif movie_id is None:
+                stats["skipped"] += 1
+                self.events.put(("skipped", item.folder_path))
+            else:
+                stats["added"] += 1
+                self.events.put(("added", movie_id, item))
+
+    def _run_job(self, job, *args):
+        if self._cancel_event.is_set():
+            return None
+        return job(*args)
+
+    def _close_worker_connections(self, pool, barrier):
+        # compute_rescan_delta opens a connection on every pool thread. One task per thread closes them all:
+        # each task waits at the barrier until all have started, so no thread can run two of them
+        wait([pool.submit(self._close_worker_connection, barrier) for _ in range(barrier.parties)])
+
+    @staticmethod
+    def _close_worker_connection(barrier):
+        try:
+            barrier.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+        close_connection()
+
+    def _collect_jobs(self, root_paths, rescan, stats):
+        """Return (device, folder_path, job, args) tuples; device groups folders that share a disk or mount."""
+        conn = get_connection()
+        known = {folder_path: (movie_id, content_type) for movie_id, folder_path, content_type
+                 in conn.execute("SELECT id, folder_path, content_type FROM movies")}
+        jobs = []
+        queued = set()
+        for root_path in root_paths:
+            try:
+                device = os.stat(root_path).st_dev
+                folders = list_title_folders(root_path)
+            except OSError as e:
+                stats["errors"] += 1
+                self.events.put(("error", root_path, str(e)))
+                continue
+            for title, folder_path in folders:
+                if folder_path in queued:
+                    continue
+                queued.add(folder_path)
+                if folder_path not in known:
+                    jobs.append((device, folder_path, scan_title, (title, folder_path)))
+                elif not rescan:
+                    stats["skipped"] += 1
+        if rescan:
+            root_prefixes = tuple(os.path.normcase(os.path.join(root_path, '')) for root_path in root_paths)
+            parent_devices = {}
+            for folder_path, (movie_id, content_type) in sorted(known.items()):
+                # Галереи не хранят список файлов, пересканировать нечего
+                if content_type != 'video': continue
+                if root_prefixes and not os.path.normcase(folder_path).startswith(root_prefixes): continue
+                # Titles are usually siblings, so one stat per parent folder is enough to find the device
+                parent = os.path.dirname(folder_path)
+                if parent not in parent_devices:
+                    try:
+                        parent_devices[parent] = os.stat(parent).st_dev
+                    except OSError:
+                        parent_devices[parent] = None  # unplugged drive: its jobs will report the error
+                jobs.append((parent_devices[parent], folder_path, compute_rescan_delta, (movie_id, folder_path)))
+        return jobs
+
+    def _write_loop(self, stats):
+        # The only thread that writes to the database: results are committed in batches of rows,
+        # or after IMPORT_BATCH_SECONDS at the latest so the UI sees progress during slow scans
+        batcher = ImportBatcher()
+        try:
+            while True:
+                try:
+                    item = self._write_queue.get(timeout=batcher.batch_seconds)
+                except queue.Empty:
+                    self._report_written(batcher.flush(), stats)
+                    continue
+                if item is _STOP_WRITER:
+                    break
+                self._report_written(batcher.add(item), stats)
+            # Titles scanned before a cancel are still written
+            self._report_written(batcher.flush(), stats)
+        except Exception as e:
+            stats["errors"] += 1
+            self.events.put(("error", "(database)", f"Writing scan results failed: {e}"))
+            self._cancel_event.set()
+        finally:
+            close_connection()
+            stats.update(batcher.stats())
+
+    def _run(self, root_paths, rescan):
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "skipped": 0, "errors": 0, "cancelled": False,
+                 "dirs_skipped": 0, "rows": 0, "batches": 0, "seconds": 0.0, "rows_per_sec": 0.0,
+                 "devices": 0}
+        write_stats = {"added": 0, "updated": 0, "unchanged": 0, "skipped": 0, "errors": 0, "dirs_skipped": 0}
+        writer = threading.Thread(target=self._write_loop, args=(write_stats,), daemon=True)
+        writer.start()
+        try:
+            jobs = self._collect_jobs(root_paths, rescan, stats)
+            total = len(jobs)
+            self.events.put(("started", total))
+            pending = {}  # device -> deque of jobs not submitted yet
+            for device, folder_path, job, args in jobs:
+                pending.setdefault(device, deque()).append((folder_path, job, args))
+            stats["devices"] = len(pending)
+            running = dict.fromkeys(pending, 0)
+            futures = {}
+            done = 0
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                try:
+                    while True:
+                        # Round-robin over devices so a large disk cannot take every worker from a small one
+                        submitted = True
+                        while submitted and len(futures) < self.max_workers and not self._cancel_event.is_set():
+                            submitted = False
+                            for device, device_jobs in pending.items():
+                                if device_jobs and running[device] < self.workers_per_device \
+                                        and len(futures) < self.max_workers:
+                                    folder_path, job, args = device_jobs.popleft()
+                                    futures[pool.submit(self._run_job, job, *args)] = (device, folder_path)
+                                    running[device] += 1
+                                    submitted = True
+                        if not futures:
+                            break
+                        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            device, folder_path = futures.pop(future)
+                            running[device] -= 1
+                            done += 1
+                            try:
+                                item = future.result()
+                                if item is not None:
+                                    self._write_queue.put(item)
+                            except Exception as e:
+                                stats["errors"] += 1
+                                self.events.put(("error", folder_path, str(e)))
+                            self.events.put(("progress", done, total))
+                finally:
+                    self._close_worker_connections(pool, threading.Barrier(self.max_workers))
+        except Exception as e:
+            stats["errors"] += 1
+            self.events.put(("error", ", ".join(root_paths) or "(library)", str(e)))
+        finally:
+            self._write_queue.put(_STOP_WRITER)
+            writer.join()
+            close_connection()
+            for key, value in write_stats.items():
+                stats[key] += value
+            stats["cancelled"] = self._cancel_event.is_set()
+            self.events.put(("finished", stats))
@@ -0,0 +1,164 @@
+# tag_index.py
+import threading
+
+
+def read_tag_bits(conn):
+    """Return (tag name -> bitset, bitset of all movies) from the database, without touching any index."""
+    tag_bits = {name: 0 for (name,) in conn.execute("SELECT name FROM tags")}
+    for name, movie_id in conn.execute(
+            "SELECT t.name, mt.movie_id FROM movie_tags mt JOIN tags t ON t.id = mt.tag_id"):
+        tag_bits[name] |= 1 << movie_id
+    all_movies = 0
+    for (movie_id,) in conn.execute("SELECT id FROM movies"):
+        all_movies |= 1 << movie_id
+    return tag_bits, all_movies
+
+
+class TagIndex:
+    # In-memory inverted index: tag name -> bitset of movie ids, stored as a Python int (bit n = movie id n).
+    # AND/OR/NOT over the whole library are then single big-int operations.
+    #
+    # It is also the observable tag model: every change to a tag is reported to the listeners as one event,
+    # so the windows can patch the affected widgets instead of rebuilding their tag lists:
+    #   ("added", name, 0)
+    #   ("removed", name, bits)            bits: the titles that had the tag
+    #   ("renamed", old_name, bits, new_name)
+    #   ("assigned", name, bits)           bits: only the titles that did not have the tag yet
+    #   ("unassigned", name, bits)         bits: only the titles that had the tag
+    # Listeners are called on the thread that made the change, after the index is updated.
+    # load() and load_bits() replace everything and send no events; whoever reloads redraws everything.
+
+    def __init__(self):
+        self.tag_bits = {}
+        self.all_movies = 0
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, *event):
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Tag listener failed on {event[0]} '{event[1]}': {e}")
+
+    def load(self, conn):
+        tag_bits, all_movies = read_tag_bits(conn)
+        with self._lock:
+            self.tag_bits = tag_bits
+            self.all_movies = all_movies
+            self.loaded = True
+
+    def load_bits(self, tag_bits, all_movies):
+        # Same as load(), from bitsets kept elsewhere (the startup snapshot)
+        with self._lock:
+            self.tag_bits = dict(tag_bits)
+            self.all_movies = all_movies
+            self.loaded = True
+
+    def add_movies(self, movie_ids):
+        with self._lock:
+            for movie_id in movie_ids:
+                self.all_movies |= 1 << movie_id
+
+    def add_tag(self, tag_name):
+        with self._lock:
+            if tag_name in self.tag_bits:
+                return
+            self.tag_bits[tag_name] = 0
+        self._notify("added", tag_name, 0)
+
+    def assign(self, movie_id, tag_name):
+        self.assign_many((movie_id,), tag_name)
+
+    def unassign(self, movie_id, tag_name):
+        self.unassign_many((movie_id,), tag_name)
+
+    def assign_many(self, movie_ids, tag_name):
+        bits = bitset_from_ids(movie_ids)
+        with self._lock:
+            if tag_name not in self.tag_bits:
+                return
+            changed = bits & ~self.tag_bits[tag_name]
+            self.tag_bits[tag_name] |= bits
+        if changed:
+            self._notify("assigned", tag_name, changed)
+
+    def unassign_many(self, movie_ids, tag_name):
+        bits = bitset_from_ids(movie_ids)
+        with self._lock:
+            if tag_name not in self.tag_bits:
+                return
+            changed = bits & self.tag_bits[tag_name]
+            self.tag_bits[tag_name] &= ~bits
+        if changed:
+            self._notify("unassigned", tag_name, changed)
+
+    def rename(self, old_name, new_name):
+        with self._lock:
+            if old_name not in self.tag_bits or new_name in self.tag_bits:
+                return
+            bits = self.tag_bits[new_name] = self.tag_bits.pop(old_name)
+        self._notify("renamed", old_name, bits, new_name)
+
+    def remove_tag(self, tag_name):
+        with self._lock:
+            if tag_name not in self.tag_bits:
+                return
+            bits = self.tag_bits.pop(tag_name)
+        self._notify("removed", tag_name, bits)
+
+    def match(self, all_of=(), any_of=(), none_of=()):
+        """Bitset of movies that have every tag in all_of, at least one tag in any_of and no tag in none_of."""
+        with self._lock:
+            bits = self.all_movies
+            for tag in all_of:
+                bits &= self.tag_bits.get(tag, 0)
+            if any_of:
+                union = 0
+                for tag in any_of:
+                    union |= self.tag_bits.get(tag, 0)
+                bits &= union
+            for tag in none_of:
+                bits &= ~self.tag_bits.get(tag, 0)
+            return bits
+
+    def count(self, tag_name, bits):
+        with self._lock:
+            return (self.tag_bits.get(tag_name, 0) & bits).bit_count()
+
+    def counts(self, bits):
+        # How many of the given movies carry each tag
+        with self._lock:
+            return {tag: (tag_bits & bits).bit_count() for tag, tag_bits in self.tag_bits.items()}
+
+
+def bitset_contains(bits):
+    """Return a fast membership test for a bitset; converting once avoids an O(n) shift per lookup."""
+    table = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    size = len(table)
+    return lambda movie_id: (movie_id >> 3) < size and (table[movie_id >> 3] >> (movie_id & 7)) & 1 == 1
+
+
+def ids_from_bitset(bits):
+    """Movie ids set in a bitset, in increasing order."""
+    table = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    return [(index << 3) | bit for index, byte in enumerate(table) if byte for bit in range(8) if byte >> bit & 1]
+
+
+def bitset_from_ids(movie_ids):
+    # Builds the bitset in a byte buffer; OR-ing 1 << id one at a time is quadratic on large libraries
+    movie_ids = list(movie_ids)
+    if not movie_ids:
+        return 0
+    table = bytearray(max(movie_ids) // 8 + 1)
+    for movie_id in movie_ids:
+        table[movie_id >> 3] |= 1 << (movie_id & 7)
+    return int.from_bytes(table, 'little')
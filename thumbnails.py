@@ -0,0 +1,172 @@
+# thumbnails.py
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from PIL import Image
+
+THUMBNAIL_DIR = os.path.join('data', 'posters', 'thumbs')
+THUMBNAIL_INDEX_PATH = os.path.join(THUMBNAIL_DIR, 'index.json')
+# Display sizes used by the grid, the hover preview and the details panel
+THUMBNAIL_SIZES = {
+    "grid": (100, 150),
+    "preview": (120, 180),
+    "details": (250, 375),
+}
+# Thumbnails are rendered larger than their display size so they stay sharp with UI scaling
+THUMBNAIL_SCALE = 2
+JPEG_QUALITY = 88
+# New entries are written to index.json at most this often, and once more at exit
+INDEX_SAVE_INTERVAL_SECONDS = 5.0
+
+_lock = threading.Lock()
+_index = None  # poster_path -> {"mtime_ns", "size", "digest", "ext"}
+_rendering = {}  # poster_path -> Event set once the thread rendering it is done
+_index_dirty = False
+_index_saved_at = 0.0
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(THUMBNAIL_INDEX_PATH, encoding='utf-8') as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+    return _index
+
+
+def _save_index():
+    global _index_dirty, _index_saved_at
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    tmp_path = THUMBNAIL_INDEX_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(_index, f)
+    os.replace(tmp_path, THUMBNAIL_INDEX_PATH)
+    _index_dirty = False
+    _index_saved_at = time.monotonic()
+
+
+def _index_changed():
+    # Rewriting the whole file for every new poster would be quadratic on the first pass over a large library
+    global _index_dirty
+    _index_dirty = True
+    if time.monotonic() - _index_saved_at >= INDEX_SAVE_INTERVAL_SECONDS:
+        _save_index()
+
+
+def flush_index():
+    """Write index entries that are not on disk yet; registered to run at exit."""
+    with _lock:
+        if _index_dirty:
+            try:
+                _save_index()
+            except OSError as e:
+                print(f"Could not save the thumbnail index: {e}")
+
+
+atexit.register(flush_index)
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _thumbnail_file(digest, variant, ext):
+    width, height = THUMBNAIL_SIZES[variant]
+    return os.path.join(THUMBNAIL_DIR, f"{digest}_{width}x{height}{ext}")
+
+
+def _render_thumbnails(poster_path, digest):
+    with Image.open(poster_path) as image:
+        largest = max(THUMBNAIL_SIZES.values())
+        # JPEG can decode straight at a reduced scale, which is much cheaper than a full decode
+        image.draft('RGB', (largest[0] * THUMBNAIL_SCALE, largest[1] * THUMBNAIL_SCALE))
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        # Other formats are decoded at full size; reduce() is a cheap integer downscale before the LANCZOS pass
+        factor = min(image.width // (largest[0] * THUMBNAIL_SCALE), image.height // (largest[1] * THUMBNAIL_SCALE))
+        if factor >= 2:
+            image = image.reduce(factor)
+        ext = '.png' if has_alpha else '.jpg'
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        for variant, (width, height) in THUMBNAIL_SIZES.items():
+            thumb = image.resize((width * THUMBNAIL_SCALE, height * THUMBNAIL_SCALE), Image.LANCZOS)
+            path = _thumbnail_file(digest, variant, ext)
+            # Posters with the same content may be rendered by two workers at once; readers never see half a file
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            if ext == '.jpg':
+                thumb.save(tmp_path, 'JPEG', quality=JPEG_QUALITY)
+            else:
+                thumb.save(tmp_path, 'PNG')
+            os.replace(tmp_path, path)
+    return ext
+
+
+def _remove_unused_thumbnails(entry):
+    if any(other["digest"] == entry["digest"] for other in _index.values()):
+        return
+    for variant in THUMBNAIL_SIZES:
+        try:
+            os.remove(_thumbnail_file(entry["digest"], variant, entry["ext"]))
+        except OSError:
+            pass
+
+
+def _ensure_thumbnails(poster_path, variants=THUMBNAIL_SIZES):
+    # A cached lookup costs one stat of the poster and one existence check per requested variant
+    while True:
+        st = os.stat(poster_path)
+        with _lock:
+            index = _load_index()
+            entry = index.get(poster_path)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            if all(os.path.exists(_thumbnail_file(entry["digest"], v, entry["ext"])) for v in variants):
+                return entry
+        with _lock:
+            rendering = _rendering.get(poster_path)
+            if rendering is None:
+                rendering = _rendering[poster_path] = threading.Event()
+                break
+        # Another worker is rendering this poster; use its result (or try again if it failed)
+        rendering.wait()
+    try:
+        # The poster is new or was replaced: re-key by content so identical posters share thumbnails.
+        # Only the index is touched under the lock, so different posters are decoded and resized in parallel
+        digest = _file_digest(poster_path)
+        ext = _render_thumbnails(poster_path, digest)
+        with _lock:
+            old_entry = index.pop(poster_path, None)
+            if old_entry and old_entry["digest"] != digest:
+                _remove_unused_thumbnails(old_entry)
+            entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "digest": digest, "ext": ext}
+            index[poster_path] = entry
+            _index_changed()
+        return entry
+    finally:
+        with _lock:
+            del _rendering[poster_path]
+        rendering.set()
+
+
+def generate_thumbnails(poster_path):
+    """Pre-render every size variant of a poster; called when a poster is set."""
+    _ensure_thumbnails(poster_path)
+
+
+def get_thumbnail_path(poster_path, variant):
+    # Path of the pre-scaled file for a poster, rendering it first if needed; None if the poster is unusable
+    if not poster_path:
+        return None
+    try:
+        entry = _ensure_thumbnails(poster_path, (variant,))
+    except Exception:
+        return None
+    return _thumbnail_file(entry["digest"], variant, entry["ext"])
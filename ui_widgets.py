@@ -0,0 +1,172 @@
+# ui_widgets.py
+import sys
+import customtkinter as ctk
+
+WHEEL_SCROLL_ROWS = 3
+
+
+class VirtualList(ctk.CTkFrame):
+    # Scrollable list that keeps a small pool of row widgets and rebinds them to data while scrolling.
+    # create_row(parent) builds one empty row of height row_height; bind_row(row, item, index) fills it.
+    # key(item) names an item (e.g. its movie id) so row_for_key() can find the row showing it.
+    # load_more() is called whenever the end of the items comes into view, for lists fetched page by page.
+    # on_layout() is called after every layout (scroll, resize, new items), once all rows are bound.
+
+    def __init__(self, master, create_row, bind_row, row_height=40, overscan=3, key=None, load_more=None,
+                 on_layout=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.key = key
+        self.load_more = load_more
+        self.on_layout = on_layout
+        self.row_height = row_height
+        self.overscan = overscan
+        self.items = []
+        self.offset = 0
+        self.rows = []
+        self.row_indices = {}  # row widget -> index of the item currently bound to it
+        self.rows_by_key = {}  # key of a bound item -> row widget showing it
+        self.row_keys = {}  # row widget -> key of its item
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.viewport.bind("<Configure>", lambda e: self.layout())
+        self.bind_wheel(self.viewport)
+
+    def set_items(self, items, keep_offset=False):
+        self.items = items
+        if not keep_offset:
+            self.offset = 0
+        self.row_indices.clear()
+        self.layout()
+
+    def refresh(self):
+        # Re-run bind_row on the rows currently on screen, e.g. after the selection changed
+        self.row_indices.clear()
+        self.layout()
+
+    def row_for_key(self, key):
+        return self.rows_by_key.get(key)
+
+    def _set_row_key(self, row, key):
+        old_key = self.row_keys.pop(row, None)
+        if old_key is not None and self.rows_by_key.get(old_key) is row:
+            del self.rows_by_key[old_key]
+        if key is not None:
+            self.row_keys[row] = key
+            self.rows_by_key[key] = row
+
+    def columns(self):
+        return 1
+
+    def line_count(self):
+        return -(-len(self.items) // self.columns())
+
+    def visible_range(self):
+        columns = self.columns()
+        first = self.offset // self.row_height * columns
+        last = min(len(self.items), ((self.offset + self.viewport.winfo_height()) // self.row_height + 1) * columns)
+        return first, last
+
+    def scroll_to(self, index):
+        line = index // self.columns()
+        if line * self.row_height < self.offset:
+            self._set_offset(line * self.row_height)
+        elif (line + 1) * self.row_height > self.offset + self.viewport.winfo_height():
+            self._set_offset((line + 1) * self.row_height - self.viewport.winfo_height())
+
+    def bind_wheel(self, widget):
+        if sys.platform.startswith("linux"):
+            widget.bind("<Button-4>", lambda e: self._scroll_rows(-WHEEL_SCROLL_ROWS))
+            widget.bind("<Button-5>", lambda e: self._scroll_rows(WHEEL_SCROLL_ROWS))
+        else:
+            widget.bind("<MouseWheel>", self._on_mousewheel)
+
+    def _on_mousewheel(self, event):
+        if sys.platform == "darwin":
+            self._scroll_rows(-event.delta)
+        else:
+            self._scroll_rows(-WHEEL_SCROLL_ROWS * event.delta // 120)
+
+    def _scroll_rows(self, rows):
+        self._set_offset(self.offset + rows * self.row_height)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self._set_offset(int(float(value) * self.line_count() * self.row_height))
+        elif unit == "pages":
+            self._set_offset(self.offset + int(value) * self.viewport.winfo_height())
+        else:
+            self._scroll_rows(int(value))
+
+    def _set_offset(self, offset):
+        max_offset = max(0, self.line_count() * self.row_height - self.viewport.winfo_height())
+        offset = max(0, min(int(offset), max_offset))
+        if offset != self.offset:
+            self.offset = offset
+            self.layout()
+
+    def place_row(self, row, index):
+        # CTk widgets take their height from the constructor, so create_row must size rows to row_height
+        row.place(x=0, y=index * self.row_height - self.offset, relwidth=1.0)
+
+    def layout(self):
+        height = self.viewport.winfo_height()
+        columns = self.columns()
+        total_height = self.line_count() * self.row_height
+        self.offset = max(0, min(self.offset, total_height - height))
+        first = max(0, self.offset // self.row_height - self.overscan) * columns
+        last = min(len(self.items), ((self.offset + height) // self.row_height + 1 + self.overscan) * columns)
+        while len(self.rows) < last - first:
+            row = self.create_row(self.viewport)
+            self.bind_wheel(row)
+            for child in row.winfo_children():
+                self.bind_wheel(child)
+            self.rows.append(row)
+        # Item i always lands in slot i % pool size, so scrolling by one line rebinds only one line of widgets
+        shown = set()
+        for index in range(first, last):
+            row = self.rows[index % len(self.rows)]
+            shown.add(row)
+            if self.row_indices.get(row) != index:
+                self.bind_row(row, self.items[index], index)
+                self.row_indices[row] = index
+                if self.key is not None:
+                    self._set_row_key(row, self.key(self.items[index]))
+            self.place_row(row, index)
+        for row in self.rows:
+            if row not in shown:
+                self.row_indices.pop(row, None)
+                self._set_row_key(row, None)
+                row.place_forget()
+        if self.load_more is not None and last >= len(self.items) - self.overscan * columns:
+            self.load_more()
+        if total_height > height:
+            self.scrollbar.set(self.offset / total_height, (self.offset + height) / total_height)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        if self.on_layout is not None:
+            self.on_layout()
+
+
+class VirtualGrid(VirtualList):
+    # Same recycling as VirtualList, but lays tiles out in as many columns as fit in the viewport width.
+    # create_row(parent) must build tiles of exactly tile_width x tile_height.
+
+    def __init__(self, master, create_row, bind_row, tile_width, tile_height, spacing=10, **kwargs):
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.spacing = spacing
+        super().__init__(master, create_row, bind_row, row_height=tile_height + spacing, **kwargs)
+
+    def columns(self):
+        return max(1, (self.viewport.winfo_width() - self.spacing) // (self.tile_width + self.spacing))
+
+    def place_row(self, row, index):
+        line, column = divmod(index, self.columns())
+        row.place(x=self.spacing + column * (self.tile_width + self.spacing),
+                  y=self.spacing + line * self.row_height - self.offset)